@@ -0,0 +1,77 @@
+"""
+Micro-benchmark of the cache serialization paths of a task
+
+Compares, for task payloads of varying description sizes, the time to write a cache entry and to turn
+a cache entry into a GET /tasks/{task_id} response body:
+
+- json: json.dumps / json.loads, then validation through the Task model and re-encoding, as before
+  (the response encoding approximates FastAPI's jsonable_encoder + JSONResponse)
+- orjson, msgpack: the tagged serializers, decoded and sent through the same response path
+- orjson fast path: the stored JSON sent as the response body as it is (cache.get_cache_json)
+
+Usage:
+    python benchmarks/bench_serialization.py [--sizes 64,1024,16384,131072]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+import serializers
+from schemas import Task
+
+def make_task(description_size: int) -> dict:
+    return {
+        "id": 42,
+        "title": "Forge a houndskull bascinet",
+        "description": "x" * description_size,
+        "status": "In Progress",
+        "createdAt": time.time(),
+        "updatedAt": time.time()
+    }
+
+def validated_response(value) -> bytes:
+    """Response body of a decoded cache value going through response model validation"""
+    return json.dumps(jsonable_encoder(Task.model_validate(value))).encode()
+
+def time_per_call(function) -> float:
+    """Best of 5 runs, in microseconds per call"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+def benchmark(description_size: int) -> list:
+    task = make_task(description_size)
+    rows = []
+    for name in ("json", "orjson", "msgpack"):
+        serializer = serializers.get_serializer(name)
+        entry = serializer.dumps(task)
+        rows.append((
+            name,
+            len(entry),
+            time_per_call(lambda: serializer.dumps(task)),
+            time_per_call(lambda: validated_response(serializers.loads(entry)))
+        ))
+    entry = serializers.get_serializer("orjson").dumps(task)
+    rows.append(("orjson fast path", len(entry), rows[1][2], time_per_call(lambda: serializers.to_json(entry))))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="64,1024,16384,131072", help="Comma-separated description sizes in bytes")
+    args = parser.parse_args()
+
+    print(f"{'description':>11} {'path':<17} {'entry bytes':>11} {'write us':>9} {'read us':>9} {'read speedup':>12}")
+    for size in (int(size) for size in args.sizes.split(",")):
+        rows = benchmark(size)
+        baseline = rows[0][3]
+        for name, entry_size, write_us, read_us in rows:
+            print(f"{size:>11} {name:<17} {entry_size:>11} {write_us:>9.2f} {read_us:>9.2f} {baseline / read_us:>11.1f}x")
+
+if __name__ == "__main__":
+    main()
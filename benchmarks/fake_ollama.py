@@ -0,0 +1,126 @@
+"""
+Fake Ollama server for benchmarks
+
+Serves /api/chat, /api/generate (streamed or not) and /api/embed with canned completions and
+deterministic embeddings, after configurable delays, so the API can be benchmarked without a GPU
+or a model. Embeddings are pseudo-random unit vectors seeded by the text, so equal texts get equal
+vectors.
+
+Usage:
+    python benchmarks/fake_ollama.py --port 11435 --delay 0.2 --token-delay 0.01
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+COMPLETION = "Verily, the smith doth temper the steel thrice ere the blade be fit for battle."
+
+class FakeOllamaConfig:
+    def __init__(self, delay=0.0, token_delay=0.0, tokens=32, embed_delay=0.0, dimension=384):
+        self.delay = delay  # Seconds before the first token of a completion
+        self.token_delay = token_delay  # Seconds between completion tokens
+        self.tokens = tokens  # Tokens per completion
+        self.embed_delay = embed_delay  # Seconds per embedding request
+        self.dimension = dimension  # Embedding dimension
+
+def embed(text: str, dimension: int) -> list:
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimension).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+def make_handler(config: FakeOllamaConfig):
+    words = (COMPLETION.split() * (config.tokens // len(COMPLETION.split()) + 1))[:config.tokens]
+    tokens = [word + " " for word in words]
+
+    class FakeOllamaHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_chunk(self, payload):
+            line = json.dumps(payload).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+
+        def _completion(self, request, prompt_tokens, make_part):
+            time.sleep(config.delay)
+            final = {
+                "model": request.get("model"),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "done": True,
+                "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens,
+                "eval_count": len(tokens)
+            }
+            if not request.get("stream", True):
+                time.sleep(config.token_delay * len(tokens))
+                self._send_json({**make_part("".join(tokens)), **final})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                self._send_chunk({"model": request.get("model"), "done": False, **make_part(token)})
+                time.sleep(config.token_delay)
+            self._send_chunk({**make_part(""), **final})
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path == "/api/chat":
+                prompt = " ".join(message.get("content", "") for message in request.get("messages", []))
+                self._completion(request, len(prompt.split()), lambda text: {"message": {"role": "assistant", "content": text}})
+            elif self.path == "/api/generate":
+                prompt = f'{request.get("system", "")} {request.get("prompt", "")}'
+                self._completion(request, len(prompt.split()), lambda text: {"response": text})
+            elif self.path == "/api/embed":
+                inputs = request.get("input", [])
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                time.sleep(config.embed_delay)
+                self._send_json({"model": request.get("model"), "embeddings": [embed(text, config.dimension) for text in inputs]})
+            else:
+                self.send_error(404)
+
+    return FakeOllamaHandler
+
+def start_fake_ollama(config: FakeOllamaConfig, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Start the fake server in a daemon thread; its URL is http://{host}:{server.server_port}"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--delay", type=float, default=0.0, help="Seconds before the first token of a completion")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between completion tokens")
+    parser.add_argument("--tokens", type=int, default=32, help="Tokens per completion")
+    parser.add_argument("--embed-delay", type=float, default=0.0, help="Seconds per embedding request")
+    parser.add_argument("--dimension", type=int, default=384, help="Embedding dimension")
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(args.delay, args.token_delay, args.tokens, args.embed_delay, args.dimension)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Fake Ollama listening on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
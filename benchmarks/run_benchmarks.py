@@ -0,0 +1,314 @@
+"""
+Benchmark suite of the API's hot paths
+
+Runs the API in process (through httpx's ASGI transport, so no network or server overhead is
+measured) against a fake Ollama server (benchmarks/fake_ollama.py) and, unless --database-url and
+--redis-url point to real ones, SQLite and fakeredis stand-ins. Reports throughput and p50/p95/p99
+latency per scenario, and knowledge base ingestion time per corpus size, and writes the results as
+JSON so they can be compared across commits.
+
+Scenarios:
+    get_task_hit     GET /tasks/{id} served from the cache
+    get_task_miss    GET /tasks/{id} with the cache entry removed beforehand
+    batch_get        POST /tasks/batch-get of --batch-size random tasks
+    list_tasks       GET /tasks pages of 100 tasks, following the cursor
+    create_task      POST /tasks
+    update_task      PUT /tasks/{id}
+    knowledge_query  POST /knowledge/query with distinct questions (retrieval and generation)
+    ingestion        Knowledge base build time for each --corpus-sizes number of files
+
+Usage:
+    python benchmarks/run_benchmarks.py [--requests 1000] [--concurrency 16] [--output results.json]
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/old.json
+
+The database given by --database-url gets the tasks table created and seeded: use a scratch database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import FakeOllamaConfig, start_fake_ollama
+
+SCENARIOS = ["get_task_hit", "get_task_miss", "batch_get", "list_tasks", "create_task", "update_task", "knowledge_query", "ingestion"]
+
+WORDS = (
+    "sword blade hilt pommel crossguard fuller mail hauberk gambeson bascinet visor gauntlet sabaton "
+    "greave cuirass plackart lance poleaxe halberd crossbow quarrel arbalest smith forge quench temper "
+    "rivet leather padding joust tourney knight squire castle siege"
+).split()
+
+def write_pdf(path: str, pages: list):
+    """Write a minimal PDF with one text line per entry of each page"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for lines in pages:
+        text = " ".join(f"({line}) Tj T*" for line in lines)
+        content = f"BT /F1 10 Tf 12 TL 40 760 Td {text} ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R /Resources << /Font << /F1 3 0 R >> >> >>" % len(objects))
+        page_ids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(b"%d 0 R" % page_id for page_id in page_ids), len(page_ids))
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def make_corpus(directory: str, files: int, pages: int, rng: random.Random):
+    """Generate a corpus of PDF files of random medieval arms and armour sentences"""
+    os.makedirs(directory, exist_ok=True)
+    for number in range(files):
+        write_pdf(
+            os.path.join(directory, f"book-{number:04d}.pdf"),
+            [[" ".join(rng.choices(WORDS, k=12)) for _ in range(50)] for _ in range(pages)]
+        )
+
+def summarize(latencies: list, errors: int, duration: float) -> dict:
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 1) if duration else None,
+        "latency_ms": {
+            "mean": round(float(latencies_ms.mean()), 3),
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 3),
+            "max": round(float(latencies_ms.max()), 3)
+        }
+    }
+
+async def run_scenario(requests: int, concurrency: int, request, prepare=None) -> dict:
+    """
+    Send requests from `concurrency` concurrent workers and time each of them
+
+    Args:
+        request: Coroutine function of the request number returning the httpx response
+        prepare: Optional coroutine function of the request number run before it, untimed
+    """
+    latencies, errors = [], 0
+    numbers = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for number in numbers:
+            if prepare is not None:
+                await prepare(number)
+            start = time.perf_counter()
+            try:
+                response = await request(number)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+async def run_api_scenarios(args, scenarios: list) -> dict:
+    import httpx
+    import cache
+    import main
+    from rag import rag_manager
+
+    if args.redis_url:
+        cache.redis_client = None
+    else:
+        import fakeredis.aioredis
+        cache.redis_client = fakeredis.aioredis.FakeRedis()
+    redis_client = cache.get_redis_client()
+    await redis_client.flushdb()
+
+    rng = random.Random(args.seed)
+    results = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://benchmark", timeout=None) as client:
+        task_ids = []
+        for start in range(0, args.tasks, 1000):
+            response = await client.post("/tasks/bulk", json={"tasks": [
+                {"title": f"Task {number}", "description": " ".join(rng.choices(WORDS, k=30))}
+                for number in range(start, min(start + 1000, args.tasks))
+            ]})
+            task_ids.extend(result["id"] for result in response.json()["results"])
+        print(f"Seeded {len(task_ids)} tasks")
+
+        def random_id(number):
+            return task_ids[rng.randrange(len(task_ids))]
+
+        for name in scenarios:
+            if name == "get_task_hit":
+                for start in range(0, len(task_ids), 1000):
+                    await client.post("/tasks/batch-get", json={"ids": task_ids[start:start + 1000]})
+                result = await run_scenario(args.requests, args.concurrency, lambda number: client.get(f"/tasks/{random_id(number)}"))
+            elif name == "get_task_miss":
+                miss_ids = {}
+
+                async def prepare(number):
+                    miss_ids[number] = random_id(number)
+                    await cache.invalidate_cache(redis_client, cache.task_cache_key(miss_ids[number]))
+
+                result = await run_scenario(args.requests, args.concurrency, lambda number: client.get(f"/tasks/{miss_ids[number]}"), prepare)
+            elif name == "batch_get":
+                result = await run_scenario(
+                    args.requests, args.concurrency,
+                    lambda number: client.post("/tasks/batch-get", json={"ids": rng.sample(task_ids, min(args.batch_size, len(task_ids)))})
+                )
+            elif name == "list_tasks":
+                cursors, cursor = [None], None
+                while len(cursors) < args.requests:
+                    response = await client.get("/tasks", params={"limit": 100, **({"cursor": cursor} if cursor else {})})
+                    cursor = response.headers.get("X-Next-Cursor")
+                    if cursor is None:
+                        break
+                    cursors.append(cursor)
+                result = await run_scenario(
+                    args.requests, args.concurrency,
+                    lambda number: client.get("/tasks", params={"limit": 100, **({"cursor": cursors[number % len(cursors)]} if cursors[number % len(cursors)] else {})})
+                )
+            elif name == "create_task":
+                result = await run_scenario(
+                    args.requests, args.concurrency,
+                    lambda number: client.post("/tasks", json={"title": f"New task {number}", "description": "Benchmark task"})
+                )
+            elif name == "update_task":
+                result = await run_scenario(
+                    args.requests, args.concurrency,
+                    lambda number: client.put(f"/tasks/{random_id(number)}", json={"title": f"Updated task {number}", "status": "In Progress"})
+                )
+            elif name == "knowledge_query":
+                if not rag_manager.is_ready:
+                    await asyncio.to_thread(rag_manager.initialize_knowledge_base)
+                result = await run_scenario(
+                    args.knowledge_requests, args.concurrency,
+                    lambda number: client.post("/knowledge/query", json={"question": f"How is a {rng.choice(WORDS)} made? ({number})"})
+                )
+            else:
+                continue
+            results[name] = result
+            print(f"{name:<16} {result['throughput_rps']:>9} req/s  p50 {result['latency_ms']['p50']:>8} ms  p95 {result['latency_ms']['p95']:>8} ms  p99 {result['latency_ms']['p99']:>8} ms  errors {result['errors']}")
+    return results
+
+def run_ingestion(args, work_dir: str) -> list:
+    import rag
+    from settings import settings
+
+    results = []
+    for files in (int(size) for size in args.corpus_sizes.split(",")):
+        settings.DATA_DIR = os.path.join(work_dir, f"corpus-{files}")
+        settings.RAG_INDEX_DIR = os.path.join(work_dir, f"index-{files}")
+        make_corpus(settings.DATA_DIR, files, args.pages_per_file, random.Random(args.seed))
+
+        manager = rag.RAGManager()
+        start = time.perf_counter()
+        stats = manager.rescan_knowledge_base()
+        seconds = time.perf_counter() - start
+        results.append({
+            "files": files,
+            "chunks": stats["embedded_chunks"],
+            "seconds": round(seconds, 3),
+            "stages": stats["ingestion"]
+        })
+        print(f"ingestion        {files:>5} files  {stats['embedded_chunks']:>6} chunks  {seconds:>8.2f} s")
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(results: dict, baseline_path: str):
+    """Print the p95 latency and throughput of each scenario relative to a previous result file"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nCompared to {baseline_path} ({baseline.get('commit')}):")
+    for name, result in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous:
+            p95_change = result["latency_ms"]["p95"] / previous["latency_ms"]["p95"] - 1
+            throughput_change = result["throughput_rps"] / previous["throughput_rps"] - 1
+            print(f"{name:<16} p95 {p95_change:+.1%}  throughput {throughput_change:+.1%}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--tasks", type=int, default=10000, help="Tasks seeded in the database")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per task scenario")
+    parser.add_argument("--knowledge-requests", type=int, default=200, help="Requests of the knowledge_query scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--batch-size", type=int, default=50, help="Tasks per batch_get request")
+    parser.add_argument("--corpus-sizes", default="5,20,50", help="Comma-separated numbers of files of the ingestion scenario")
+    parser.add_argument("--pages-per-file", type=int, default=10, help="Pages per generated PDF file")
+    parser.add_argument("--knowledge-files", type=int, default=10, help="Files of the knowledge base queried by knowledge_query")
+    parser.add_argument("--llm-delay", type=float, default=0.05, help="Fake Ollama seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Fake Ollama seconds between tokens")
+    parser.add_argument("--embed-delay", type=float, default=0.005, help="Fake Ollama seconds per embedding request")
+    parser.add_argument("--database-url", help="Database to benchmark against (default: a temporary SQLite database)")
+    parser.add_argument("--redis-url", help="Redis to benchmark against (default: fakeredis)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", help="Previous result file to compare with")
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+
+    fake_ollama = start_fake_ollama(FakeOllamaConfig(delay=args.llm_delay, token_delay=args.token_delay, embed_delay=args.embed_delay))
+    work_dir = tempfile.mkdtemp(prefix="taskapi-benchmark-")
+
+    # The application reads its settings at import, so configure it first
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{fake_ollama.server_port}"
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{os.path.join(work_dir, 'tasks.db')}"
+    os.environ["DATA_DIR"] = os.path.join(work_dir, "knowledge")
+    os.environ["RAG_INDEX_DIR"] = os.path.join(work_dir, "knowledge-index")
+    os.environ["EMBEDDING_CACHE_PATH"] = ""  # Measure cold embedding, not cache hits across runs
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    make_corpus(os.environ["DATA_DIR"], args.knowledge_files, args.pages_per_file, random.Random(args.seed))
+
+    import init_db
+    init_db.init_db()
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": asyncio.run(run_api_scenarios(args, [name for name in scenarios if name != "ingestion"])),
+        "ingestion": run_ingestion(args, work_dir) if "ingestion" in scenarios else []
+    }
+
+    output = args.output or os.path.join(REPO_DIR, "benchmarks", "results", f"{datetime.now():%Y%m%d-%H%M%S}-{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    fake_ollama.shutdown()
+
+if __name__ == "__main__":
+    main()
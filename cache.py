@@ -1,38 +1,329 @@
 import redis
+import redis.asyncio
 import json
-from models import Task
+import time
+import asyncio
+import hashlib
+import os
+import socket
+import threading
+import numpy as np
+import orjson
+import serializers
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+from typing import Mapping, Optional
 from settings import settings
+from metrics import CACHE_LOOKUPS, REDIS_LATENCY
+
+# One asyncio connection pool per process, shared by all requests (created by get_redis_client)
+redis_client = None
+
+# Process-local hit/miss counters per key namespace
+_stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+_stats_lock = threading.Lock()
+
+# Calls in flight in this process, keyed by what they compute (see coalesce)
+_inflight = {}
+
+# While Redis is failing, the cache is bypassed until this time instead of waiting on timeouts every request
+_redis_unavailable_until = 0.0
+# Consecutive Redis failures; the cache is bypassed once they reach REDIS_FAILURE_THRESHOLD
+_redis_failures = 0
+
+# Keys that could not be deleted or overwritten while Redis was failing. They may still hold values
+# replaced in the database, so they are deleted before the cache is used again (see _redis_ready).
+_pending_invalidations = set()
+# Namespaces deleted entirely instead, once more than REDIS_PENDING_INVALIDATIONS_MAX keys were pending
+_pending_namespaces = set()
+# Held by the request deleting the pending keys (created on first use so it belongs to the running event loop)
+_flush_lock = None
 
 def get_redis_client():
-    """Create and return a Redis client"""
-    return redis.from_url(settings.REDIS_URL)
+    """Return the process-wide pooled Redis client, created on first use so it belongs to the running event loop"""
+    global redis_client
+    if redis_client is None:
+        redis_pool = redis.asyncio.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
+        )
+        redis_client = redis.asyncio.Redis(connection_pool=redis_pool)
+    return redis_client
+
+async def get_redis():
+    """Dependency for the shared Redis client"""
+    return get_redis_client()
+
+def cache_key(namespace, identifier):
+    """Build a cache key under the API's key prefix, e.g. taskapi:task:42"""
+    return f"{settings.REDIS_KEY_PREFIX}{namespace}:{identifier}"
+
+def task_cache_key(task_id):
+    """Cache key of a task"""
+    return cache_key("task", task_id)
+
+def summary_cache_key(task_id):
+    """Cache key of a task's generated summaries"""
+    return cache_key("summary", task_id)
+
+def version_key(key):
+    """Key of the version (e.g. updatedAt) of the value cached under a key, e.g. taskapi:version:task:42"""
+    return cache_key("version", key[len(settings.REDIS_KEY_PREFIX):])
 
-def set_cache(redis_client, key, value, expiration=None):
+def normalize_question(question):
+    """Normalize a question for exact-match answer caching (case and whitespace insensitive)"""
+    return " ".join(question.lower().split())
+
+def answer_cache_key(scope, question):
+    """Cache key of the answer to a question, within a scope such as the endpoint, model and index generation"""
+    digest = hashlib.sha256(f"{scope}\n{normalize_question(question)}".encode()).hexdigest()
+    return cache_key("answer", digest)
+
+def _namespace(key):
+    return key[len(settings.REDIS_KEY_PREFIX):].split(":", 1)[0]
+
+def record_lookup(namespace, hit):
+    """Count a cache hit or miss in a namespace for the cache stats"""
+    with _stats_lock:
+        _stats[namespace]["hits" if hit else "misses"] += 1
+    CACHE_LOOKUPS.labels(namespace=namespace, result="hit" if hit else "miss").inc()
+
+def _record(key, hit):
+    record_lookup(_namespace(key), hit)
+
+def _redis_available():
+    return time.monotonic() >= _redis_unavailable_until
+
+def _pool_exhausted(error):
+    """Whether an error is the connection pool having no free connection in time (local contention, not Redis failing)"""
+    return isinstance(error, redis.ConnectionError) and str(error) == "No connection available."
+
+def _redis_succeeded():
+    global _redis_failures
+    _redis_failures = 0
+
+def _redis_failed(operation, key, error):
+    """
+    Record a Redis failure; after REDIS_FAILURE_THRESHOLD consecutive ones, the cache is bypassed for
+    REDIS_RETRY_INTERVAL seconds. Waiting too long for a pooled connection does not count.
+    """
+    global _redis_unavailable_until, _redis_failures
+    if _pool_exhausted(error):
+        print(f"------------------------------ Redis {operation} for {key} got no pooled connection in time: {error}")
+        return
+    
+    _redis_failures += 1
+    if _redis_failures < settings.REDIS_FAILURE_THRESHOLD:
+        print(f"------------------------------ Redis {operation} failed for {key} ({_redis_failures} consecutive failures): {error}")
+        return
+    _redis_failures = 0
+    _redis_unavailable_until = time.monotonic() + settings.REDIS_RETRY_INTERVAL
+    print(f"------------------------------ Redis {operation} failed for {key}, bypassing cache for {settings.REDIS_RETRY_INTERVAL}s: {error}")
+
+def _invalidation_failed(keys):
+    """
+    Remember keys whose stale values could not be removed from Redis, to remove them once it is back
+    
+    Beyond REDIS_PENDING_INVALIDATIONS_MAX keys, their namespaces are remembered instead, so memory
+    stays bounded however long Redis fails.
+    """
+    local_cache.discard(*keys)
+    _pending_invalidations.update(key for key in keys if _namespace(key) not in _pending_namespaces)
+    if len(_pending_invalidations) > settings.REDIS_PENDING_INVALIDATIONS_MAX:
+        namespaces = {_namespace(key) for key in _pending_invalidations}
+        _pending_namespaces.update(namespaces)
+        _pending_invalidations.clear()
+        print(f"------------------------------ Too many keys left stale while Redis is failing, deleting the {', '.join(sorted(namespaces))} namespaces once it is back")
+
+async def _redis_ready(redis_client):
+    """
+    Whether the cache can be used: Redis is not being bypassed and the keys left stale by failed
+    writes, if any, have been deleted
+    
+    A single request deletes the pending keys; the others bypass the cache until it is done.
+    """
+    global _flush_lock
+    if not _redis_available():
+        return False
+    if not _pending_invalidations and not _pending_namespaces:
+        return True
+    if _flush_lock is None:
+        _flush_lock = asyncio.Lock()
+    if _flush_lock.locked():
+        return False
+    
+    async with _flush_lock:
+        keys = list(_pending_invalidations)
+        namespaces = list(_pending_namespaces)
+        try:
+            for namespace in namespaces:
+                async for key in redis_client.scan_iter(match=cache_key(namespace, "*"), count=1000):
+                    keys.append(key.decode())
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for start in range(0, len(keys), settings.BULK_BATCH_SIZE):
+                    pipe.delete(*keys[start:start + settings.BULK_BATCH_SIZE])
+                _publish_invalidation(pipe, [key for key in keys if _local_namespace(key)])
+                with REDIS_LATENCY.labels(command="DEL").time():
+                    await pipe.execute()
+        except redis.RedisError as e:
+            _redis_failed("DEL", f"{len(keys)} pending keys", e)
+            return False
+        _redis_succeeded()
+        _pending_invalidations.difference_update(keys)
+        _pending_namespaces.difference_update(namespaces)
+        print(f"------------------------------ Deleted {len(keys)} keys left stale while Redis was failing")
+        return True
+
+# Writes a value and its version unless a newer version of it was cached by a concurrent writer.
+# The version outlives deletions of the value for as long as the value would have, so a stale write
+# landing after an invalidation is rejected too.
+SET_IF_NEWER_SCRIPT = """
+local cached = redis.call('GET', KEYS[2])
+if cached and tonumber(cached) > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('SETEX', KEYS[1], ARGV[2], ARGV[3])
+redis.call('SETEX', KEYS[2], ARGV[2], ARGV[1])
+return 1
+"""
+
+def _set_if_newer(pipe, key, expiration, serialized, version):
+    """Queue a versioned write of a key on a pipeline (see SET_IF_NEWER_SCRIPT)"""
+    # EVAL rather than a registered script: pipelines check registered scripts with an extra round trip
+    pipe.eval(SET_IF_NEWER_SCRIPT, 2, key, version_key(key), repr(float(version)), expiration, serialized)
+
+TASK_FIELDS = ("id", "title", "description", "status", "createdAt", "updatedAt")
+
+def task_to_dict(task):
+    """Convert a task (SQLAlchemy model instance or row mapping) to the dict stored in the cache"""
+    if isinstance(task, Mapping):
+        return {field: task[field] for field in TASK_FIELDS}
+    return {field: getattr(task, field) for field in TASK_FIELDS}
+
+async def set_cache(redis_client, key, value, expiration=None, invalidate=(), version=None, changed=False):
     """
     Store a value in Redis cache
     
     Args:
         redis_client: Redis client instance
         key: Cache key
-        value: Value to cache (SQLAlchemy model instance)
+        value: Value to cache (SQLAlchemy model instance or JSON-serializable value)
         expiration: Cache expiration time in seconds (default: from settings)
+        invalidate: Keys to delete in the same round trip, e.g. values derived from the one being replaced
+        version: Version of the value, e.g. a task's updatedAt. If given, the value is only written when no
+            newer version is cached, so concurrent writers finishing out of order cannot leave a stale value.
+        changed: Whether the value changed in the database (rather than being read back from it), so the
+            value it replaces must not be served should the write fail
     """
     if expiration is None:
         expiration = settings.REDIS_CACHE_EXPIRATION
 
+    # Values being replaced by a database change must not be served once Redis is back
+    stale_on_failure = (key, *invalidate) if changed else tuple(invalidate)
+    if not await _redis_ready(redis_client):
+        if stale_on_failure:
+            _invalidation_failed(stale_on_failure)
+        return
+
     # Convert SQLAlchemy model to dict
     if hasattr(value, "__dict__"):
-        value_dict = {
-            "id": value.id,
-            "title": value.title,
-            "description": value.description,
-            "status": value.status,
-            "createdAt": value.createdAt,
-            "updatedAt": value.updatedAt
-        }
-        redis_client.setex(key, expiration, json.dumps(value_dict))
+        value = task_to_dict(value)
+    serialized = serializers.dumps(value)
+    local_cache.discard(*invalidate)
+    # Other workers may hold the previous value in their in-process tier
+    stale_keys = [stale_key for stale_key in (key, *invalidate) if _local_namespace(stale_key)]
+    
+    written = True
+    try:
+        if invalidate or stale_keys or version is not None:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                if version is None:
+                    pipe.setex(key, expiration, serialized)
+                else:
+                    _set_if_newer(pipe, key, expiration, serialized, version)
+                if invalidate:
+                    pipe.delete(*invalidate)
+                _publish_invalidation(pipe, stale_keys)
+                with REDIS_LATENCY.labels(command="SETEX").time():
+                    written = bool((await pipe.execute())[0])
+        else:
+            with REDIS_LATENCY.labels(command="SETEX").time():
+                await redis_client.setex(key, expiration, serialized)
+    except redis.RedisError as e:
+        if stale_on_failure:
+            _invalidation_failed(stale_on_failure)
+        _redis_failed("SETEX", key, e)
+        return
+    _redis_succeeded()
+    
+    if not written:
+        local_cache.discard(key)
+    elif _local_tier(key):
+        local_cache.put(key, value, len(serialized))
 
-def get_cache(redis_client, key):
+async def set_cache_many(redis_client, values, expiration=None, versions=None):
+    """
+    Store many values in Redis cache in a single pipelined round trip
+    
+    Meant for back-filling values just read from the database, so no invalidation is published.
+    
+    Args:
+        redis_client: Redis client instance
+        values: Dict mapping cache keys to values (SQLAlchemy model instances or JSON-serializable values)
+        expiration: Cache expiration time in seconds (default: from settings)
+        versions: Dict mapping cache keys to the versions of their values, written only if newer (see set_cache)
+    """
+    if expiration is None:
+        expiration = settings.REDIS_CACHE_EXPIRATION
+
+    if not values or not await _redis_ready(redis_client):
+        return
+
+    serialized = {key: serializers.dumps(task_to_dict(value) if hasattr(value, "__dict__") else value) for key, value in values.items()}
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for key, data in serialized.items():
+                if versions is None:
+                    pipe.setex(key, expiration, data)
+                else:
+                    _set_if_newer(pipe, key, expiration, data, versions[key])
+            with REDIS_LATENCY.labels(command="SETEX").time():
+                written = await pipe.execute()
+    except redis.RedisError as e:
+        _redis_failed("SETEX", f"{len(values)} keys", e)
+        return
+    _redis_succeeded()
+    
+    for (key, data), key_written in zip(serialized.items(), written):
+        if key_written and _local_tier(key):
+            local_cache.put(key, values[key], len(data))
+
+async def _get_serialized(redis_client, key):
+    """Fetch the serialized value of a key from Redis, or None if not found or Redis is unavailable"""
+    if not await _redis_ready(redis_client):
+        _record(key, hit=False)
+        return None
+
+    try:
+        with REDIS_LATENCY.labels(command="GET").time():
+            cached_data = await redis_client.get(key)
+        _redis_succeeded()
+    except redis.RedisError as e:
+        _redis_failed("GET", key, e)
+        cached_data = None
+    _record(key, hit=bool(cached_data))
+    return cached_data or None
+
+def _get_local(key):
+    value = local_cache.get(key)
+    record_lookup(f"{_namespace(key)}-local", hit=value is not None)
+    return value
+
+async def get_cache(redis_client, key):
     """
     Retrieve a value from Redis cache
     
@@ -41,19 +332,484 @@ def get_cache(redis_client, key):
         key: Cache key
         
     Returns:
-        Cached value or None if not found
+        Cached value or None if not found or Redis is unavailable
+    """
+    local = _local_tier(key)
+    if local:
+        value = _get_local(key)
+        if value is not None:
+            return value
+
+    cached_data = await _get_serialized(redis_client, key)
+    if cached_data is None:
+        return None
+    value = serializers.loads(cached_data)
+    if local:
+        local_cache.put(key, value, len(cached_data))
+    return value
+
+async def get_cache_json(redis_client, key):
+    """
+    Retrieve a value from Redis cache as JSON bytes
+    
+    Entries written as JSON are returned as they are, without being decoded, so they can be sent as
+    a response body directly.
+    
+    Args:
+        redis_client: Redis client instance
+        key: Cache key
+        
+    Returns:
+        JSON encoding of the cached value or None if not found or Redis is unavailable
+    """
+    local = _local_tier(key)
+    if local:
+        value = _get_local(key)
+        if value is not None:
+            return orjson.dumps(value)
+
+    cached_data = await _get_serialized(redis_client, key)
+    if cached_data is None:
+        return None
+    if local:
+        local_cache.put(key, serializers.loads(cached_data), len(cached_data))
+    return serializers.to_json(cached_data)
+
+async def get_cache_many(redis_client, keys):
+    """
+    Retrieve many values from Redis cache in a single MGET
+    
+    Args:
+        redis_client: Redis client instance
+        keys: Cache keys
+        
+    Returns:
+        List of the cached values, in the order of the keys, with None for keys not found
+    """
+    values = [None] * len(keys)
+    remote = []
+    for index, key in enumerate(keys):
+        if _local_tier(key):
+            values[index] = _get_local(key)
+        if values[index] is None:
+            remote.append(index)
+    if not remote:
+        return values
+    
+    if not await _redis_ready(redis_client):
+        for index in remote:
+            _record(keys[index], hit=False)
+        return values
+
+    try:
+        with REDIS_LATENCY.labels(command="MGET").time():
+            cached_data = await redis_client.mget([keys[index] for index in remote])
+        _redis_succeeded()
+    except redis.RedisError as e:
+        _redis_failed("MGET", f"{len(remote)} keys", e)
+        cached_data = [None] * len(remote)
+    for index, data in zip(remote, cached_data):
+        _record(keys[index], hit=bool(data))
+        if data:
+            values[index] = serializers.loads(data)
+            if _local_tier(keys[index]):
+                local_cache.put(keys[index], values[index], len(data))
+    return values
+
+async def get_cache_field(redis_client, key, field):
+    """
+    Retrieve a field of a Redis hash cache entry
+    
+    Args:
+        redis_client: Redis client instance
+        key: Cache key
+        field: Hash field, e.g. a fingerprint of the inputs the cached value was computed from
+        
+    Returns:
+        Cached string or None if not found or Redis is unavailable
     """
-    cached_data = redis_client.get(key)
-    if cached_data:
-        return json.loads(cached_data)
+    if not await _redis_ready(redis_client):
+        _record(key, hit=False)
+        return None
+
+    try:
+        with REDIS_LATENCY.labels(command="HGET").time():
+            cached_data = await redis_client.hget(key, field)
+        _redis_succeeded()
+    except redis.RedisError as e:
+        _redis_failed("HGET", key, e)
+        cached_data = None
+    _record(key, hit=cached_data is not None)
+    if cached_data is not None:
+        return cached_data.decode()
     return None
 
-def invalidate_cache(redis_client, key):
+async def set_cache_field(redis_client, key, field, value, expiration=None):
     """
-    Remove a value from Redis cache
+    Store a value as the only field of a Redis hash cache entry, replacing values cached for other fields
     
     Args:
         redis_client: Redis client instance
-        key: Cache key to invalidate
+        key: Cache key
+        field: Hash field
+        value: String to cache
+        expiration: Cache expiration time in seconds (default: from settings)
+    """
+    if expiration is None:
+        expiration = settings.REDIS_CACHE_EXPIRATION
+
+    if not await _redis_ready(redis_client):
+        return
+
+    try:
+        pipeline = redis_client.pipeline()
+        pipeline.delete(key)
+        pipeline.hset(key, field, value)
+        pipeline.expire(key, expiration)
+        with REDIS_LATENCY.labels(command="HSET").time():
+            await pipeline.execute()
+        _redis_succeeded()
+    except redis.RedisError as e:
+        _redis_failed("HSET", key, e)
+
+async def invalidate_cache(redis_client, *keys):
     """
-    redis_client.delete(key) 
\ No newline at end of file
+    Remove values from Redis cache
+    
+    Any number of keys is removed in a single round trip, pipelining one DEL per BULK_BATCH_SIZE keys.
+    Keys of the in-process tier are also removed from it and an invalidation message is published
+    for the other workers. Keys that cannot be removed while Redis is failing are removed once it is back.
+    
+    Args:
+        redis_client: Redis client instance
+        keys: Cache keys to invalidate
+    """
+    if not keys:
+        return
+    stale_keys = [key for key in keys if _local_namespace(key)]
+    local_cache.discard(*stale_keys)
+    if not await _redis_ready(redis_client):
+        _invalidation_failed(keys)
+        return
+    try:
+        if len(keys) <= settings.BULK_BATCH_SIZE and not stale_keys:
+            with REDIS_LATENCY.labels(command="DEL").time():
+                await redis_client.delete(*keys)
+        else:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for start in range(0, len(keys), settings.BULK_BATCH_SIZE):
+                    pipe.delete(*keys[start:start + settings.BULK_BATCH_SIZE])
+                _publish_invalidation(pipe, stale_keys)
+                with REDIS_LATENCY.labels(command="DEL").time():
+                    await pipe.execute()
+        _redis_succeeded()
+    except redis.RedisError as e:
+        _invalidation_failed(keys)
+        _redis_failed("DEL", f"{len(keys)} keys" if len(keys) > 3 else ", ".join(keys), e)
+
+async def coalesce(key, compute):
+    """
+    Run compute() once for concurrent callers in this process sharing the same key
+    
+    The first caller starts the computation as a task; callers arriving while it runs await the same task
+    and receive the same result (or exception). A caller being cancelled does not cancel the computation
+    for the others.
+    """
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(compute())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+@asynccontextmanager
+async def cache_lock(redis_client, key, timeout):
+    """
+    Hold a Redis lock shared by all workers, waiting up to `timeout` seconds for it
+    
+    Yields whether the lock was acquired; if it was not (timeout or Redis unavailable) the caller proceeds
+    without it rather than failing the request.
+    """
+    lock = redis_client.lock(f"{key}:lock", timeout=timeout, blocking_timeout=timeout)
+    try:
+        acquired = _redis_available() and await lock.acquire()
+    except redis.RedisError as e:
+        _redis_failed("LOCK", key, e)
+        acquired = False
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except redis.RedisError:
+                # Expired or Redis unavailable, either way no longer held
+                pass
+
+class SemanticAnswerCache:
+    """
+    In-process cache of answers indexed by the embedding of their question
+    
+    A lookup returns the answer of the most similar cached question in the same scope, if its cosine
+    similarity reaches the threshold. Entries expire after a TTL and the least recently used entry is
+    evicted when the cache is full. Vectors live in one preallocated matrix so a lookup is a single
+    matrix-vector product.
+    """
+
+    def __init__(self, max_entries: int, threshold: float, expiration: int):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.expiration = expiration
+        self._vectors = None
+        self._entries = OrderedDict()  # slot -> (scope, answer, expires_at), least recently used first
+        self._free_slots = list(range(max_entries))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, scope: str, vector) -> Optional[str]:
+        """Return the answer of the most similar unexpired question in the scope, or None"""
+        query = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != query.shape[0]:
+                return None
+            
+            slots = [slot for slot, (entry_scope, _, expires_at) in self._entries.items() if entry_scope == scope and expires_at > now]
+            if not slots:
+                return None
+            
+            similarities = self._vectors[slots] @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+            
+            self._entries.move_to_end(slots[best])
+            return self._entries[slots[best]][1]
+
+    def put(self, scope: str, vector, answer: str):
+        """Cache the answer to a question, evicting expired entries and then the least recently used one if full"""
+        vector = self._normalize(vector)
+        now = time.monotonic()
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                # First entry, or the embedding model changed
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._entries.clear()
+                self._free_slots = list(range(self.max_entries))
+            
+            if not self._free_slots:
+                for slot in [slot for slot, (_, _, expires_at) in self._entries.items() if expires_at <= now]:
+                    del self._entries[slot]
+                    self._free_slots.append(slot)
+            if not self._free_slots:
+                slot, _ = self._entries.popitem(last=False)
+                self._free_slots.append(slot)
+            
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = (scope, answer, now + self.expiration)
+
+    def __len__(self):
+        return len(self._entries)
+
+semantic_answer_cache = SemanticAnswerCache(
+    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+    threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+    expiration=settings.ANSWER_CACHE_EXPIRATION
+)
+
+class LocalCache:
+    """
+    In-process LRU cache of decoded Redis values, in front of Redis for hot keys
+    
+    Bounded by entry count and by the serialized size of the values, with a short TTL. Workers publish
+    the keys they change on the invalidation channel and evict the keys published by the others (see
+    listen_for_invalidations); while the process is not subscribed, the tier is bypassed and emptied.
+    Cached values are shared between requests and must not be mutated.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, expiration: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.expiration = expiration
+        self.subscribed = False
+        self._entries = OrderedDict()  # key -> (value, size, expires_at), least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return the unexpired value of a key, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: str, value, size: int):
+        """Cache a value, evicting the least recently used entries beyond the entry and byte bounds"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.expiration)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": settings.LOCAL_CACHE_ENABLED,
+                "subscribed": self.subscribed,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes
+            }
+
+local_cache = LocalCache(
+    max_entries=settings.LOCAL_CACHE_MAX_ENTRIES,
+    max_bytes=settings.LOCAL_CACHE_MAX_BYTES,
+    expiration=settings.LOCAL_CACHE_EXPIRATION
+)
+
+def _local_namespace(key):
+    """Whether a key belongs to a namespace served by the in-process tier"""
+    return settings.LOCAL_CACHE_ENABLED and _namespace(key) in settings.LOCAL_CACHE_NAMESPACES
+
+def _local_tier(key):
+    """Whether a key can be served from the in-process tier right now"""
+    return local_cache.subscribed and _local_namespace(key)
+
+def invalidation_channel():
+    return f"{settings.REDIS_KEY_PREFIX}invalidate"
+
+def _sender_id():
+    # Distinct per worker, including workers forked after import
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _publish_invalidation(pipeline, keys):
+    """Queue invalidation messages for keys of the in-process tier on a pipeline"""
+    for start in range(0, len(keys), settings.BULK_BATCH_SIZE):
+        message = json.dumps({"sender": _sender_id(), "keys": keys[start:start + settings.BULK_BATCH_SIZE]})
+        pipeline.publish(invalidation_channel(), message)
+
+def create_pubsub_client():
+    """Dedicated Redis client for the invalidation subscription, which blocks on reads without a socket timeout"""
+    return redis.asyncio.Redis.from_url(
+        settings.REDIS_URL,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL
+    )
+
+async def listen_for_invalidations():
+    """
+    Keep the in-process tier coherent with the other workers
+    
+    Subscribes to the invalidation channel and evicts the keys published by other workers. The tier is
+    only used while subscribed: on any subscription error it is emptied and bypassed until the
+    subscription is re-established, REDIS_RETRY_INTERVAL seconds later.
+    """
+    while True:
+        client = create_pubsub_client()
+        pubsub = client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(invalidation_channel())
+            local_cache.clear()
+            local_cache.subscribed = True
+            print("------------------------------ Subscribed to cache invalidations")
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                data = json.loads(message["data"])
+                if data["sender"] != _sender_id():
+                    local_cache.discard(*data["keys"])
+        except (redis.RedisError, OSError, ValueError) as e:
+            print(f"------------------------------ Cache invalidation subscription failed, bypassing the in-process cache for {settings.REDIS_RETRY_INTERVAL}s: {e}")
+        finally:
+            local_cache.subscribed = False
+            local_cache.clear()
+            try:
+                await pubsub.close()
+                await client.close()
+            except (redis.RedisError, OSError):
+                pass
+        await asyncio.sleep(settings.REDIS_RETRY_INTERVAL)
+
+def start_invalidation_listener() -> Optional[asyncio.Task]:
+    """Start listen_for_invalidations in the background if the in-process tier is enabled"""
+    if not settings.LOCAL_CACHE_ENABLED:
+        return None
+    return asyncio.create_task(listen_for_invalidations())
+
+async def get_cache_stats(redis_client):
+    """
+    Report key counts, estimated memory and hit/miss counts per key namespace
+    
+    Keys are enumerated with SCAN restricted to the API's key prefix, so Redis is never blocked the way
+    KEYS blocks it. Memory is estimated from MEMORY USAGE of up to CACHE_STATS_MEMORY_SAMPLE keys per
+    namespace. Hit/miss counts are those of the current process.
+    
+    Args:
+        redis_client: Redis client instance
+        
+    Returns:
+        Dict mapping each namespace to its keys, memory_bytes (None if unknown), hits, misses and hit_rate
+    """
+    key_counts = defaultdict(int)
+    samples = defaultdict(list)
+    async for key in redis_client.scan_iter(match=f"{settings.REDIS_KEY_PREFIX}*", count=settings.CACHE_STATS_SCAN_COUNT):
+        namespace = _namespace(key.decode())
+        key_counts[namespace] += 1
+        if len(samples[namespace]) < settings.CACHE_STATS_MEMORY_SAMPLE:
+            samples[namespace].append(key)
+    
+    with _stats_lock:
+        counters = {namespace: dict(counts) for namespace, counts in _stats.items()}
+    
+    namespaces = {}
+    for namespace in sorted(set(key_counts) | set(counters)):
+        memory_bytes = None
+        if samples.get(namespace):
+            pipeline = redis_client.pipeline(transaction=False)
+            for key in samples[namespace]:
+                pipeline.memory_usage(key)
+            # MEMORY USAGE may be disabled (e.g. on managed Redis) or the key may have expired meanwhile
+            usages = [usage for usage in await pipeline.execute(raise_on_error=False) if isinstance(usage, int)]
+            if usages:
+                memory_bytes = round(sum(usages) * key_counts[namespace] / len(usages))
+        
+        hits = counters.get(namespace, {}).get("hits", 0)
+        misses = counters.get(namespace, {}).get("misses", 0)
+        namespaces[namespace] = {
+            "keys": key_counts.get(namespace, 0),
+            "memory_bytes": memory_bytes,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0
+        }
+    return namespaces
@@ -1,9 +1,11 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 import time
 from sqlalchemy.exc import OperationalError
+from metrics import instrument_engine
 
 # Get database URL from environment variable or use default
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/taskmanagement")
@@ -22,15 +24,28 @@ def get_engine(retries=5, delay=2):
             time.sleep(delay)  # Wait before retrying
             print(f"Retrying database connection... Attempt {i + 2}/{retries}")
 
+def get_async_database_url(url):
+    """Database URL for the async engine: the same database through the asyncpg (or aiosqlite) driver"""
+    for scheme, async_scheme in (
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(scheme):
+            return async_scheme + url[len(scheme):]
+    return url
+
+# The synchronous engine is used by init_db.py; the API serves requests through the async engine
 engine = get_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(get_async_database_url(DATABASE_URL), pool_pre_ping=True)
+instrument_engine(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
-    """Dependency for database session"""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """Dependency for async database session"""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close() 
\ No newline at end of file
@@ -2,8 +2,11 @@ from database import engine
 import models
 
 def init_db():
-    """Create database tables"""
+    """Create database tables, and the indexes missing from tables created by earlier versions"""
     models.Base.metadata.create_all(bind=engine)
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
 
 if __name__ == "__main__":
     init_db()
@@ -0,0 +1,210 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import httpx
+import numpy as np
+import ollama
+from typing import Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+from settings import settings
+from metrics import observe_generation
+
+def create_ollama_client(client_class=ollama.Client):
+    """
+    Create an Ollama client (sync or async) backed by a pooled, keep-alive HTTP connection
+
+    The sync client is thread-safe and the async client is shared by all requests of the event loop,
+    so a single instance of each is created per process.
+    """
+    return client_class(
+        host=settings.OLLAMA_HOST,
+        timeout=httpx.Timeout(settings.OLLAMA_TIMEOUT, connect=settings.OLLAMA_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            keepalive_expiry=settings.OLLAMA_KEEPALIVE_EXPIRY
+        )
+    )
+
+class EmbeddingCache:
+    """
+    On-disk cache of embeddings keyed by the hash of the model and the text, shared by the workers of a host
+
+    Backed by SQLite in WAL mode, with one connection per thread. Vectors are stored as float32, the
+    precision FAISS keeps them in. Entries of other models are dropped when the cache is opened, and
+    the oldest entries beyond max_entries whenever embeddings are added.
+    """
+
+    def __init__(self, path: str, model: str, max_entries: int):
+        self.path = path
+        self.model = model
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL)")
+            connection.execute("DELETE FROM embeddings WHERE model != ?", (model,))
+            self._evict(connection)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model}\0{text}".encode()).digest()
+
+    def get_many(self, texts: List[str]) -> Dict[str, List[float]]:
+        """Cached embeddings of the texts, by text"""
+        keys = {self.key(text): text for text in texts}
+        found = {}
+        connection = self._connection()
+        # SQLite limits the number of bound parameters per statement
+        key_list = list(keys)
+        for start in range(0, len(key_list), 500):
+            chunk = key_list[start:start + 500]
+            rows = connection.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            for key, vector in rows:
+                found[keys[key]] = np.frombuffer(vector, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, embeddings: Dict[str, List[float]]):
+        with self._connection() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [(self.key(text), self.model, np.asarray(vector, dtype=np.float32).tobytes()) for text, vector in embeddings.items()]
+            )
+            self._evict(connection)
+
+    def _evict(self, connection: sqlite3.Connection):
+        """Delete the oldest entries beyond max_entries"""
+        # Rows get increasing rowids as they are inserted, so this is a range delete on the rowid rather than a count
+        connection.execute("DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?", (self.max_entries,))
+
+class OllamaClientEmbeddings(Embeddings):
+    """
+    LangChain embeddings using the shared Ollama clients, embedding a whole batch of texts per request
+
+    With a cache, only the texts it does not hold are sent to Ollama, each once per batch.
+    """
+
+    def __init__(self, client: ollama.Client, model: str, async_client: ollama.AsyncClient = None, cache: Optional[EmbeddingCache] = None):
+        self.client = client
+        self.async_client = async_client
+        self.model = model
+        self.cache = cache
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        return list(self.client.embed(model=self.model, input=texts)["embeddings"])
+
+    async def _aembed(self, texts: List[str]) -> List[List[float]]:
+        if self.async_client is None:
+            return await asyncio.to_thread(self._embed, texts)
+        return list((await self.async_client.embed(model=self.model, input=texts))["embeddings"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self.cache is None:
+            return self._embed(texts)
+        
+        embeddings = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in embeddings))
+        if missing:
+            computed = dict(zip(missing, self._embed(missing)))
+            self.cache.put_many(computed)
+            embeddings.update(computed)
+        return [embeddings[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        if self.cache is None:
+            return await self._aembed(texts)
+        
+        embeddings = await asyncio.to_thread(self.cache.get_many, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in embeddings))
+        if missing:
+            computed = dict(zip(missing, await self._aembed(missing)))
+            await asyncio.to_thread(self.cache.put_many, computed)
+            embeddings.update(computed)
+        return [embeddings[text] for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+_llm_semaphore = None
+
+def llm_slot() -> asyncio.Semaphore:
+    """
+    Semaphore bounding the LLM generations in flight in this process to LLM_MAX_CONCURRENCY
+
+    Requests waiting for a slot hold no thread, so CRUD endpoints keep being served while the LLM is
+    saturated. Created on first use so it belongs to the running event loop.
+    """
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+async def stream_chat(messages: List[dict], operation: str):
+    """
+    Stream the tokens of a chat completion as Ollama produces them, holding an LLM slot until the stream ends
+
+    Closing the generator early (e.g. when the client disconnects) closes the HTTP response,
+    which makes Ollama stop generating.
+
+    Args:
+        messages: Chat messages
+        operation: Kind of request (e.g. summary, query) its metrics are recorded under
+    """
+    async with llm_slot():
+        start = time.perf_counter()
+        stream = await async_ollama_client.chat(model=settings.OLLAMA_MODEL, messages=messages, stream=True)
+        try:
+            async for part in stream:
+                if part["message"]["content"]:
+                    yield part["message"]["content"]
+                if part.get("done"):
+                    observe_generation(operation, part, time.perf_counter() - start)
+        finally:
+            await stream.aclose()
+
+async def stream_generate(prompt: str, system: str, operation: str):
+    """Stream the tokens of a completion as Ollama produces them (see stream_chat)"""
+    async with llm_slot():
+        start = time.perf_counter()
+        stream = await async_ollama_client.generate(model=settings.OLLAMA_MODEL, prompt=prompt, system=system, stream=True)
+        try:
+            async for part in stream:
+                if part["response"]:
+                    yield part["response"]
+                if part.get("done"):
+                    observe_generation(operation, part, time.perf_counter() - start)
+        finally:
+            await stream.aclose()
+
+def create_embeddings() -> OllamaClientEmbeddings:
+    """Embeddings with OLLAMA_EMBEDDING_MODEL through the shared clients, cached in EMBEDDING_CACHE_PATH if set"""
+    cache = None
+    if settings.EMBEDDING_CACHE_PATH:
+        try:
+            cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.OLLAMA_EMBEDDING_MODEL, settings.EMBEDDING_CACHE_MAX_ENTRIES)
+        except (sqlite3.Error, OSError) as e:
+            print(f"------------------------------ Embedding cache {settings.EMBEDDING_CACHE_PATH} unavailable, embedding without it: {e}")
+    return OllamaClientEmbeddings(ollama_client, settings.OLLAMA_EMBEDDING_MODEL, async_client=async_ollama_client, cache=cache)
+
+# Created once per process: the sync client for knowledge base ingestion threads,
+# the async client for the API endpoints
+ollama_client = create_ollama_client()
+async_ollama_client = create_ollama_client(ollama.AsyncClient)
@@ -0,0 +1,18 @@
+"""
+Parsing of knowledge base files, run in the worker processes of the ingestion pool
+
+Kept apart from rag so spawned workers only import the document loaders, not the RAG manager, the
+Ollama clients, the embedding cache or the metrics.
+"""
+from typing import List
+from langchain_community.document_loaders import PyPDFLoader, UnstructuredEPubLoader
+from langchain.schema import Document
+
+
+def load_file_documents(path: str) -> List[Document]:
+    """Parse a PDF or EPUB file into one Document per page/element"""
+    if path.endswith(".pdf"):
+        loader = PyPDFLoader(path)
+    else:
+        loader = UnstructuredEPubLoader(path)
+    return loader.load()
@@ -1,187 +1,639 @@
-from typing import List, Optional
+from typing import List, Literal, Optional
+from contextlib import asynccontextmanager
+import asyncio
 import time
 import os
-from fastapi import FastAPI, HTTPException, Depends, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from database import get_db
+import json
+import hashlib
+import base64
+import csv
+import io
+import gzip
+import zlib
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, insert, update, delete, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+import redis
+import redis.asyncio
+from database import get_db, async_engine
 from models import Task as TaskModel
-from schemas import Task, TaskCreate, TaskUpdate, TaskSummary, KnowledgeQuery, KnowledgeResponse, DocumentsResponse, DocumentContent
-from cache import get_redis_client, set_cache, get_cache, invalidate_cache
-import ollama
+from schemas import Task, TaskCreate, TaskUpdate, TaskBulkCreate, TaskBulkUpdate, TaskBulkDelete, TaskBatchGet, TaskBatchGetResponse, BulkItemResult, BulkResponse, TaskSummary, KnowledgeQuery, KnowledgeResponse, DocumentsResponse, DocumentContent, KnowledgeRescanResponse, KnowledgeStatus, CacheStats
+from cache import get_redis, set_cache, set_cache_many, task_to_dict, TASK_FIELDS, get_cache, get_cache_json, get_cache_many, invalidate_cache, task_cache_key, summary_cache_key, get_cache_field, set_cache_field, coalesce, cache_lock, answer_cache_key, semantic_answer_cache, record_lookup, get_cache_stats, local_cache, start_invalidation_listener
+from llm import async_ollama_client, llm_slot, stream_chat
+from metrics import RequestLatencyMiddleware, LLM_STAGE_LATENCY, METRICS_CONTENT_TYPE, observe_generation, latest_metrics
 from rag import rag_manager
 from settings import settings
 
-app = FastAPI(title="Task Management API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Build the knowledge base in the background so the task endpoints serve traffic right away, and
+    subscribe to cache invalidations if the in-process cache tier is enabled.
+    """
+    rag_manager.start_background_initialization()
+    invalidation_listener = start_invalidation_listener()
+    yield
+    if invalidation_listener is not None:
+        invalidation_listener.cancel()
+
+app = FastAPI(title="Task Management API", lifespan=lifespan)
+
+app.add_middleware(RequestLatencyMiddleware)
+
+# Columns of a task, selected or returned as plain rows where no ORM object is needed
+TASK_COLUMNS = [getattr(TaskModel, field) for field in TASK_FIELDS]
+
+async def require_knowledge_base():
+    """
+    Dependency rejecting knowledge base requests with 503 until the index is ready, and swapping in
+    the generation another worker published since the last request.
+    """
+    if rag_manager.has_new_generation:
+        await asyncio.to_thread(rag_manager.refresh)
+    if not rag_manager.is_ready:
+        detail = "Knowledge base index is warming up. Check GET /knowledge/status and retry."
+        if rag_manager.status == "failed":
+            detail = f"Knowledge base index build failed, retrying in the background: {rag_manager.error}. Check GET /knowledge/status."
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": "10"}
+        )
+
+def task_summary_messages(task_description: str) -> List[dict]:
+    """Chat messages asking the model for a summary of a task."""
+    return [
+        {
+            "role": "system",
+            "content": settings.SYSTEM_MESSAGES["task_summary"]
+        },
+        {
+            "role": "user",
+            "content": f"Please summarize the following task description in a few sentences: {task_description}"
+        }
+    ]
 
-def generate_task_summary(task_description: str) -> str:
+def query_messages(question: str) -> List[dict]:
+    """Chat messages asking the model a general question."""
+    return [
+        {
+            "role": "system",
+            "content": settings.SYSTEM_MESSAGES["knowledge_base"]
+        },
+        {
+            "role": "user",
+            "content": f"Answer the following question: {question}"
+        }
+    ]
+
+async def generate_task_summary(task_description: str) -> str:
     """
     Generate a summary of a task using Ollama's LLM serving on the LLaMa3.2-medieval model.
     """
-    try:
-        ollama.host = settings.OLLAMA_HOST
-        
-        response = ollama.chat(
+    async with llm_slot():
+        start = time.perf_counter()
+        response = await async_ollama_client.chat(
             model=settings.OLLAMA_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": settings.SYSTEM_MESSAGES["task_summary"]
-                },
-                {
-                    "role": "user",
-                    "content": f"Please summarize the following task description in a few sentences: {task_description}"
-                }
-            ]
+            messages=task_summary_messages(task_description)
         )
+        observe_generation("summary", response, time.perf_counter() - start)
 
-        return response['message']['content']
+    return response['message']['content']
+
+def summary_fingerprint(title: str, description: str, task_status: str) -> str:
+    """Hash of everything a cached summary depends on: the task content, the model and the system prompt."""
+    inputs = [title, description, task_status, settings.OLLAMA_MODEL, settings.SYSTEM_MESSAGES["task_summary"]]
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+async def get_or_generate_task_summary(redis_client: redis.asyncio.Redis, task_id: int, fingerprint: str, task_information: str) -> str:
+    """
+    Return the cached summary of a task or generate and cache it.
+
+    Concurrent requests for the same uncached summary are coalesced within the process and serialized across
+    workers by a Redis lock, so only one of them calls the LLM and the others reuse its cached result.
+    """
+    key = summary_cache_key(task_id)
+    summary = await get_cache_field(redis_client, key, fingerprint)
+    if summary is not None:
+        return summary
+
+    async def generate():
+        async with cache_lock(redis_client, f"{key}:{fingerprint}", timeout=settings.SUMMARY_LOCK_TIMEOUT) as locked:
+            # Another worker may have generated it while we waited for the lock
+            if locked:
+                summary = await get_cache_field(redis_client, key, fingerprint)
+                if summary is not None:
+                    return summary
+
+            summary = await generate_task_summary(task_description=task_information)
+            await set_cache_field(redis_client, key, fingerprint, summary, expiration=settings.SUMMARY_CACHE_EXPIRATION)
+            return summary
+
+    return await coalesce(f"{key}:{fingerprint}", generate)
+
+
+async def lookup_semantic_answer(redis_client: redis.asyncio.Redis, scope: str, question: str):
+    """
+    Look up an answer by embedding similarity among the questions recently answered by this process,
+    if ANSWER_CACHE_SEMANTIC is set. A hit is copied to the exact-match Redis entry of the question.
+
+    Returns:
+        Tuple of the answer (None on a miss) and the question embedding (None if it was not computed)
+    """
+    if not settings.ANSWER_CACHE_SEMANTIC:
+        return None, None
+
+    try:
+        with LLM_STAGE_LATENCY.labels(operation=scope.split(":", 1)[0], stage="embedding").time():
+            vector = await rag_manager.ollama_embeddings.aembed_query(question)
+        answer = semantic_answer_cache.get(semantic_scope(scope), vector)
     except Exception as e:
-        print(f"Error generating task summary: {e}")
-        return "Unable to connect to Ollama service. Please try again later."
+        # The semantic tier is optional: without embeddings the answer is generated
+        print(f"------------------------------ Semantic answer cache unavailable: {e}")
+        record_lookup("answer-semantic", hit=False)
+        return None, None
+    record_lookup("answer-semantic", hit=answer is not None)
+    if answer is not None:
+        await set_cache(redis_client, answer_cache_key(scope, question), answer, expiration=settings.ANSWER_CACHE_EXPIRATION)
+    return answer, vector
+
+async def store_answer(redis_client: redis.asyncio.Redis, scope: str, question: str, answer: str, vector=None):
+    """Cache a generated answer in Redis and, if its question embedding is known, in the semantic cache."""
+    await set_cache(redis_client, answer_cache_key(scope, question), answer, expiration=settings.ANSWER_CACHE_EXPIRATION)
+    if vector is not None:
+        semantic_answer_cache.put(semantic_scope(scope), vector, answer)
+
+async def get_or_generate_answer(redis_client: redis.asyncio.Redis, scope: str, question: str, generate) -> str:
+    """
+    Return a cached answer to a question or generate and cache it.
+
+    Answers are looked up by exact (normalized) question in Redis and then by similarity (see
+    lookup_semantic_answer). The question embedding is passed on to the `generate` coroutine function so retrieval can reuse it.
+    """
+    key = answer_cache_key(scope, question)
+    answer = await get_cache(redis_client, key)
+    if answer is not None:
+        return answer
+
+    async def generate_and_cache():
+        answer, vector = await lookup_semantic_answer(redis_client, scope, question)
+        if answer is not None:
+            return answer
+
+        answer = await generate(vector)
+        await store_answer(redis_client, scope, question, answer, vector)
+        return answer
+
+    return await coalesce(key, generate_and_cache)
+
+def semantic_scope(scope: str) -> str:
+    """Question embeddings are only comparable when computed by the same embedding model."""
+    return f"{scope}:{rag_manager.ollama_embeddings.model}"
 
+def knowledge_answer_scope() -> str:
+    """Answers to knowledge base queries depend on the models, the system prompt and the index generation (per embedding model)."""
+    generation = rag_manager.index.manifest["generation"] if rag_manager.index else 0
+    return f'knowledge:{settings.OLLAMA_MODEL}:{rag_manager.ollama_embeddings.model}:{generation}:{settings.SYSTEM_MESSAGES["knowledge_base"]}'
+
+def query_answer_scope() -> str:
+    return f'query:{settings.OLLAMA_MODEL}:{settings.SYSTEM_MESSAGES["knowledge_base"]}'
+
+
+async def get_task_fields(task_id: int, db: AsyncSession, redis_client: redis.asyncio.Redis) -> dict:
+    """Retrieve the fields of a task from the Redis cache or else from the database, for building LLM prompts."""
+    cached_task = await get_cache(redis_client, task_cache_key(task_id))
+    if cached_task:
+        print(f"------------------------------ Task retrieved from Redis: {cached_task}")
+        return cached_task
+
+    db_task = await db.get(TaskModel, task_id)
+    if db_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    print(f"------------------------------ Task retrieved from database: {db_task}")
+    return task_to_dict(db_task)
+
+def summary_task_information(task: dict) -> str:
+    return f'Task ID: {task["id"]}. Title: {task["title"]}. Description: {task["description"]}. Status: {task["status"]}. Created at {task["createdAt"]} and updated at {task["updatedAt"]}.'
+
+def hints_task_information(task: dict) -> str:
+    return f'Task Title: {task["title"]}. Description: {task["description"]}.'
+
+def sse_event(data: dict, event: Optional[str] = None) -> str:
+    """Format a Server-Sent Event with a JSON payload."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def stream_cached_text(text: str, **info):
+    """Events of a text served from a cache: the whole text as one token, then the end of the stream."""
+    yield sse_event({"token": text})
+    yield sse_event({"cached": True, **info}, event="done")
+
+async def stream_tokens(tokens, on_complete, **info):
+    """
+    Forward the tokens of a generation as Server-Sent Events and cache the complete text once the stream ends.
+
+    Each token is sent as a `data: {"token": ...}` event, followed by an `event: done` event, or an
+    `event: error` event if generation fails. If the client disconnects, the response is cancelled and
+    closing the token generator stops the generation in Ollama; incomplete texts are never cached.
+
+    Args:
+        tokens: Async generator of text tokens
+        on_complete: Coroutine function storing the complete text
+        info: Extra fields of the `done` event
+    """
+    parts = []
+    try:
+        async for token in tokens:
+            parts.append(token)
+            yield sse_event({"token": token})
+        await on_complete("".join(parts))
+        yield sse_event({"cached": False, **info}, event="done")
+    except Exception as e:
+        print(f"------------------------------ Error streaming generation: {e}")
+        yield sse_event({"detail": str(e)}, event="error")
+    finally:
+        await tokens.aclose()
+
+
+def encode_cursor(order_by: str, db_task: TaskModel) -> str:
+    """Opaque cursor resuming a task listing after the given task."""
+    key = [db_task.id] if order_by == "id" else [db_task.updatedAt, db_task.id]
+    return base64.urlsafe_b64encode(json.dumps({"order_by": order_by, "after": key}).encode()).decode()
+
+def decode_cursor(cursor: str, order_by: str) -> list:
+    """Decode a cursor of a listing in the given order, or raise a 400 error."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        key = data["after"]
+        valid = data["order_by"] == order_by and len(key) == (1 if order_by == "id" else 2)
+    except Exception:
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid cursor for this order_by")
+    return key
+
+def filter_tasks(query, task_status: Optional[str], updated_since: Optional[float]):
+    """Apply the status and updated-since filters of the task listings to a query."""
+    if task_status is not None:
+        if task_status not in settings.VALID_TASK_STATUSES:
+            raise HTTPException(status_code=400, detail=f"Invalid status value. Must be one of: {', '.join(settings.VALID_TASK_STATUSES)}")
+        query = query.where(TaskModel.status == task_status)
+    if updated_since is not None:
+        query = query.where(TaskModel.updatedAt >= updated_since)
+    return query
 
 @app.get("/tasks", response_model=List[Task])
-def get_tasks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Retrieve all tasks."""
-    tasks = db.query(TaskModel).offset(skip).limit(limit).all()
+async def get_tasks(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    order_by: Literal["id", "updatedAt"] = "id",
+    cursor: Optional[str] = None,
+    task_status: Optional[str] = Query(None, alias="status"),
+    updated_since: Optional[float] = None,
+    skip: int = Query(0, ge=0, description="Deprecated offset, ignored when a cursor is given"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Retrieve tasks in ascending id or updatedAt order, optionally filtered on status and last update time.
+
+    Pagination is keyset based: when more tasks follow, the X-Next-Cursor response header holds the cursor
+    to pass to get the next page. Each page is an index range scan, however deep the page.
+    """
+    query = filter_tasks(select(TaskModel), task_status, updated_since)
+
+    if order_by == "id":
+        query = query.order_by(TaskModel.id)
+        if cursor is not None:
+            query = query.where(TaskModel.id > decode_cursor(cursor, order_by)[0])
+    else:
+        query = query.order_by(TaskModel.updatedAt, TaskModel.id)
+        if cursor is not None:
+            query = query.where(tuple_(TaskModel.updatedAt, TaskModel.id) > tuple(decode_cursor(cursor, order_by)))
+
+    if cursor is None and skip:
+        query = query.offset(skip)
+
+    # Fetch one extra row to know whether there is a next page
+    result = await db.execute(query.limit(limit + 1))
+    tasks = result.scalars().all()
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(order_by, tasks[-1])
     return tasks
 
 @app.post("/tasks", response_model=Task, status_code=status.HTTP_201_CREATED)
-def create_task(task: TaskCreate, db: Session = Depends(get_db)):
-    """Create a new task"""
-    db_task = TaskModel(
-        title=task.title,
-        description=task.description,
-        status="Backlog"
+async def create_task(task: TaskCreate, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """Create a new task with a single INSERT ... RETURNING and write it through to the Redis cache."""
+    now = time.time()
+    result = await db.execute(
+        insert(TaskModel)
+        .values(title=task.title, description=task.description, status="Backlog", createdAt=now, updatedAt=now)
+        .returning(*TASK_COLUMNS)
     )
-    db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    db_task = task_to_dict(result.mappings().one())
+    await db.commit()
+
+    await set_cache(redis_client, task_cache_key(db_task["id"]), db_task, version=db_task["updatedAt"])
     return db_task
 
+async def export_tasks(query, export_format: str):
+    """
+    Stream the rows of a query as NDJSON lines or CSV records.
+
+    Rows are fetched through a server-side cursor, EXPORT_BATCH_SIZE at a time, as plain Core rows
+    (no ORM objects or identity map) and each batch is written out as one chunk, so memory use is
+    constant however many rows are exported. The connection is owned by the generator so it stays
+    open for the whole response.
+    """
+    async with async_engine.connect() as connection:
+        result = await connection.stream(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(TASK_FIELDS)
+            async for rows in result.partitions():
+                writer.writerows(rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            async for rows in result.partitions():
+                yield "".join(json.dumps(dict(zip(TASK_FIELDS, row))) + "\n" for row in rows)
+
+# Export and bulk routes are declared before /tasks/{task_id} so "export" and "bulk" are not taken for task IDs
+@app.get("/tasks/export")
+async def export_all_tasks(
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    task_status: Optional[str] = Query(None, alias="status"),
+    updated_since: Optional[float] = None
+):
+    """Export all tasks, optionally filtered on status and last update time, as streamed NDJSON or CSV in id order."""
+    query = filter_tasks(select(*TASK_COLUMNS), task_status, updated_since).order_by(TaskModel.id)
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_tasks(query, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="tasks.{export_format}"'}
+    )
+
+def check_bulk_size(count: int):
+    if count > settings.BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items in bulk request. At most {settings.BULK_MAX_ITEMS} are allowed.")
+
+def batches(items: list, size: int = None):
+    """Split a list into consecutive batches of BULK_BATCH_SIZE items."""
+    size = size or settings.BULK_BATCH_SIZE
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+def bulk_response(results: List[BulkItemResult]) -> BulkResponse:
+    failed = sum(1 for result in results if result.status_code >= 400)
+    return BulkResponse(succeeded=len(results) - failed, failed=failed, results=results)
+
+async def get_existing_task_ids(db: AsyncSession, task_ids: List[int]) -> set:
+    """IDs among the given ones that exist in the tasks table, queried with one IN list per batch."""
+    existing = set()
+    for batch in batches(sorted(set(task_ids))):
+        result = await db.execute(select(TaskModel.id).where(TaskModel.id.in_(batch)))
+        existing.update(result.scalars().all())
+    return existing
+
+@app.post("/tasks/bulk", response_model=BulkResponse)
+async def create_tasks_bulk(bulk: TaskBulkCreate, db: AsyncSession = Depends(get_db)):
+    """Create many tasks in one transaction, with multi-row INSERT statements of BULK_BATCH_SIZE rows."""
+    check_bulk_size(len(bulk.tasks))
+    now = time.time()
+    rows = [
+        {"title": task.title, "description": task.description, "status": "Backlog", "createdAt": now, "updatedAt": now}
+        for task in bulk.tasks
+    ]
+
+    task_ids = []
+    for batch in batches(rows):
+        result = await db.execute(insert(TaskModel).returning(TaskModel.id, sort_by_parameter_order=True), batch)
+        task_ids.extend(result.scalars().all())
+    await db.commit()
+
+    return bulk_response([
+        BulkItemResult(index=index, id=task_id, status_code=status.HTTP_201_CREATED)
+        for index, task_id in enumerate(task_ids)
+    ])
+
+@app.patch("/tasks/bulk", response_model=BulkResponse)
+async def update_tasks_bulk(bulk: TaskBulkUpdate, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """
+    Update many tasks in one transaction, with batched UPDATE statements by primary key.
+
+    Items with an invalid status or an unknown task ID are reported as failed and the others are applied.
+    The cache entries of the updated tasks are invalidated in a single pipelined Redis call.
+    """
+    check_bulk_size(len(bulk.tasks))
+    existing = await get_existing_task_ids(db, [task.id for task in bulk.tasks])
+    now = time.time()
+
+    results, rows = [], []
+    for index, task in enumerate(bulk.tasks):
+        if task.status is not None and task.status not in settings.VALID_TASK_STATUSES:
+            results.append(BulkItemResult(index=index, id=task.id, status_code=400, detail=f"Invalid status value. Must be one of: {', '.join(settings.VALID_TASK_STATUSES)}"))
+        elif task.id not in existing:
+            results.append(BulkItemResult(index=index, id=task.id, status_code=404, detail="Task not found"))
+        else:
+            rows.append({"id": task.id, **task.model_dump(exclude={"id"}, exclude_none=True), "updatedAt": now})
+            results.append(BulkItemResult(index=index, id=task.id, status_code=status.HTTP_200_OK))
+
+    for batch in batches(rows):
+        await db.execute(update(TaskModel), batch)
+    await db.commit()
+
+    updated_ids = {row["id"] for row in rows}
+    await invalidate_cache(redis_client, *[key for task_id in updated_ids for key in (task_cache_key(task_id), summary_cache_key(task_id))])
+
+    return bulk_response(results)
+
+@app.delete("/tasks/bulk", response_model=BulkResponse)
+async def delete_tasks_bulk(bulk: TaskBulkDelete, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """
+    Delete many tasks in one transaction, with one DELETE ... RETURNING statement per BULK_BATCH_SIZE IDs.
+
+    Unknown task IDs are reported as failed. The cache entries of the deleted tasks are invalidated
+    in a single pipelined Redis call.
+    """
+    check_bulk_size(len(bulk.ids))
+    deleted_ids = set()
+    for batch in batches(sorted(set(bulk.ids))):
+        result = await db.execute(delete(TaskModel).where(TaskModel.id.in_(batch)).returning(TaskModel.id))
+        deleted_ids.update(result.scalars().all())
+    await db.commit()
+
+    await invalidate_cache(redis_client, *[key for task_id in deleted_ids for key in (task_cache_key(task_id), summary_cache_key(task_id))])
+
+    results, seen = [], set()
+    for index, task_id in enumerate(bulk.ids):
+        if task_id in deleted_ids and task_id not in seen:
+            results.append(BulkItemResult(index=index, id=task_id, status_code=status.HTTP_204_NO_CONTENT))
+        else:
+            results.append(BulkItemResult(index=index, id=task_id, status_code=404, detail="Task not found"))
+        seen.add(task_id)
+    return bulk_response(results)
+
+@app.post("/tasks/batch-get", response_model=TaskBatchGetResponse)
+async def batch_get_tasks(batch: TaskBatchGet, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """
+    Retrieve many tasks at once, in the order of the requested IDs.
+
+    Cached tasks are read with a single MGET, the misses with a single IN query, and those are
+    back-filled into the cache in one pipelined round trip.
+    """
+    if len(batch.ids) > settings.BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"Too many IDs. At most {settings.BATCH_GET_MAX_IDS} are allowed.")
+    task_ids = list(dict.fromkeys(batch.ids))
+
+    cached_tasks = await get_cache_many(redis_client, [task_cache_key(task_id) for task_id in task_ids])
+    tasks = {task_id: task for task_id, task in zip(task_ids, cached_tasks) if task is not None}
+
+    misses = [task_id for task_id in task_ids if task_id not in tasks]
+    if misses:
+        result = await db.execute(select(*TASK_COLUMNS).where(TaskModel.id.in_(misses)))
+        fetched = {row["id"]: task_to_dict(row) for row in result.mappings()}
+        await set_cache_many(
+            redis_client,
+            {task_cache_key(task_id): task for task_id, task in fetched.items()},
+            versions={task_cache_key(task_id): task["updatedAt"] for task_id, task in fetched.items()}
+        )
+        tasks.update(fetched)
+
+    return TaskBatchGetResponse(
+        tasks=[tasks.get(task_id) for task_id in batch.ids],
+        missing=[task_id for task_id in task_ids if task_id not in tasks]
+    )
+
 @app.get("/tasks/{task_id}", response_model=Task)
-def get_task(task_id: int, db: Session = Depends(get_db)):
+async def get_task(task_id: int, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
     """Retrieve a specific task by ID and set Redis caching."""
-    # Try to get task from cache
-    redis_client = get_redis_client()
-    cached_task = get_cache(redis_client, f"task:{task_id}")
+    # Try to get task from cache, sent as its stored JSON without validating it again
+    cached_task = await get_cache_json(redis_client, task_cache_key(task_id))
     
     if cached_task:
-        return cached_task
+        return Response(content=cached_task, media_type="application/json")
     
     # If not in cache, get from database
-    db_task = db.query(TaskModel).filter(TaskModel.id == task_id).first()
+    db_task = await db.get(TaskModel, task_id)
     if db_task is None:
         raise HTTPException(status_code=404, detail="Task not found")
     
-    # Store in cache
-    set_cache(redis_client, f"task:{task_id}", db_task)
+    # Store in cache, unless a concurrent update already cached a newer version
+    await set_cache(redis_client, task_cache_key(task_id), db_task, version=db_task.updatedAt)
     
     return db_task
 
 
 @app.put("/tasks/{task_id}", response_model=Task)
-def update_task(task_id: int, task: TaskUpdate, db: Session = Depends(get_db)):
-    """Update an existing task and invalidate the Redis cache."""
-    db_task = db.query(TaskModel).filter(TaskModel.id == task_id).first()
-    if db_task is None:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    # Update task fields if provided
-    if task.title is not None:
-        db_task.title = task.title
-    if task.description is not None:
-        db_task.description = task.description
-    if task.status is not None:
-        if task.status not in settings.VALID_TASK_STATUSES:
-            raise HTTPException(status_code=400, detail=f"Invalid status value. Must be one of: {', '.join(settings.VALID_TASK_STATUSES)}")
-        db_task.status = task.status
+async def update_task(task_id: int, task: TaskUpdate, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """
+    Update an existing task with a single UPDATE ... RETURNING and write the new row through to the Redis cache,
+    so the next read of the task is a cache hit. Its cached summaries are invalidated in the same round trip.
+    """
+    values = task.model_dump(exclude_none=True)
+    if "status" in values and values["status"] not in settings.VALID_TASK_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status value. Must be one of: {', '.join(settings.VALID_TASK_STATUSES)}")
     
     # Update the updatedAt timestamp
-    db_task.updatedAt = time.time()
+    values["updatedAt"] = time.time()
     
-    db.commit()
-    db.refresh(db_task)
+    result = await db.execute(
+        update(TaskModel)
+        .where(TaskModel.id == task_id)
+        .values(**values)
+        .returning(*TASK_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.mappings().one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    db_task = task_to_dict(row)
+    await db.commit()
     
-    # Invalidate cache
-    redis_client = get_redis_client()
-    invalidate_cache(redis_client, f"task:{task_id}")
+    # Versioned, so concurrent updates writing the cache out of commit order cannot leave the older row cached
+    await set_cache(redis_client, task_cache_key(task_id), db_task, invalidate=(summary_cache_key(task_id),), version=db_task["updatedAt"], changed=True)
     
     return db_task
 
 @app.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_task(task_id: int, db: Session = Depends(get_db)):
-    """Delete a task and invalidate the Redis cache."""
-    db_task = db.query(TaskModel).filter(TaskModel.id == task_id).first()
-    if db_task is None:
+async def delete_task(task_id: int, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """Delete a task with a single DELETE ... RETURNING and invalidate the Redis cache."""
+    result = await db.execute(
+        delete(TaskModel)
+        .where(TaskModel.id == task_id)
+        .returning(TaskModel.id)
+        .execution_options(synchronize_session=False)
+    )
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    db.delete(db_task)
-    db.commit()
+    await db.commit()
     
     # Invalidate cache
-    redis_client = get_redis_client()
-    invalidate_cache(redis_client, f"task:{task_id}")
+    await invalidate_cache(redis_client, task_cache_key(task_id), summary_cache_key(task_id))
     
     return None
 
 
 @app.get("/tasks/{task_id}/summary", response_model=TaskSummary)
-def get_task_summary(task_id: int, db: Session = Depends(get_db)):
+async def get_task_summary(task_id: int, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
     """Retrieve a specific task by ID with Redis caching. Get a summary of the task using the LLaMa3.2-medieval model."""
-    # Try to get task from cache
-    redis_client = get_redis_client()
-    cached_task = get_cache(redis_client, f"task:{task_id}")
-
-    # TODO: Show all keys from Redis
-    print(f"------------------------------ Redis keys: {redis_client.keys()}")
+    db_task = await get_task_fields(task_id, db, redis_client)
+    task_information = summary_task_information(db_task)
+    fingerprint = summary_fingerprint(db_task["title"], db_task["description"], db_task["status"])
     
-    if cached_task:
-        db_task = cached_task
-        task_information = f'Task ID: {db_task["id"]}. Title: {db_task["title"]}. Description: {db_task["description"]}. Status: {db_task["status"]}. Created at {db_task["createdAt"]} and updated at {db_task["updatedAt"]}.'
-        print(f"------------------------------ Task retrieved from Redis: {db_task}")
-    else:    
-        # If not in cache, get from database
-        db_task = db.query(TaskModel).filter(TaskModel.id == task_id).first()
-        if db_task is None:
-            raise HTTPException(status_code=404, detail="Task not found")
-        
-        print(f"------------------------------ Task retrieved from database: {db_task}")
-        task_information = f'Task ID: {db_task.id}. Title: {db_task.title}. Description: {db_task.description}. Status: {db_task.status}. Created at {db_task.createdAt} and updated at {db_task.updatedAt}.'
-        
-    
-    str_task_summary = generate_task_summary(task_description=task_information)
+    try:
+        str_task_summary = await get_or_generate_task_summary(redis_client, task_id, fingerprint, task_information)
+    except Exception as e:
+        print(f"Error generating task summary: {e}")
+        str_task_summary = "Unable to connect to Ollama service. Please try again later."
     
     task_summary = TaskSummary(task_information=task_information, task_summary=str_task_summary)
     
     return task_summary
 
+@app.get("/tasks/{task_id}/summary/stream")
+async def stream_task_summary(task_id: int, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """Stream the summary of a task as Server-Sent Events, as the LLaMa3.2-medieval model generates it."""
+    db_task = await get_task_fields(task_id, db, redis_client)
+    task_information = summary_task_information(db_task)
+    fingerprint = summary_fingerprint(db_task["title"], db_task["description"], db_task["status"])
+    key = summary_cache_key(task_id)
+
+    summary = await get_cache_field(redis_client, key, fingerprint)
+    if summary is not None:
+        return sse_response(stream_cached_text(summary, task_information=task_information))
+
+    async def store(summary):
+        await set_cache_field(redis_client, key, fingerprint, summary, expiration=settings.SUMMARY_CACHE_EXPIRATION)
+
+    return sse_response(stream_tokens(stream_chat(task_summary_messages(task_information), operation="summary"), store, task_information=task_information))
+
         
-@app.get("/tasks/{task_id}/knowledge/hints", response_model=TaskSummary)
-def get_knowledge_task_hints(task_id: int, db: Session = Depends(get_db)):
+@app.get("/tasks/{task_id}/knowledge/hints", response_model=TaskSummary, dependencies=[Depends(require_knowledge_base)])
+async def get_knowledge_task_hints(task_id: int, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
     """Retrieve a specific task by ID with Redis caching. Get knowledge hints about the task using RAG (PDF/EPUB files) and the LLaMa3.2-medieval model."""
-    # Try to get task from cache
-    redis_client = get_redis_client()
-    cached_task = get_cache(redis_client, f"task:{task_id}")
-    
-    if cached_task:
-        db_task = cached_task
-        task_information = f'Task Title: {db_task["title"]}. Description: {db_task["description"]}.'
-        print(f"------------------------------ Task retrieved from Redis: {db_task}")
-    else:    
-        # If not in cache, get from database
-        db_task = db.query(TaskModel).filter(TaskModel.id == task_id).first()
-        if db_task is None:
-            raise HTTPException(status_code=404, detail="Task not found")
-        
-        print(f"------------------------------ Task retrieved from database: {db_task}")
-        task_information = f'Task Title: {db_task.title}. Description: {db_task.description}.'
-   
-    
+    task_information = hints_task_information(await get_task_fields(task_id, db, redis_client))
     query = KnowledgeQuery(question=f"{task_information}. ")
 
     try:
-        answer = rag_manager.query_knowledge_base(query.question)
+        answer = await get_or_generate_answer(
+            redis_client,
+            knowledge_answer_scope(),
+            query.question,
+            lambda vector: rag_manager.query_knowledge_base(query.question, query_vector=vector)
+        )
         knowledge_task_hints = TaskSummary(task_information=task_information, task_summary=answer)
         
         return knowledge_task_hints
@@ -192,46 +644,97 @@ def get_knowledge_task_hints(task_id: int, db: Session = Depends(get_db)):
             detail=f"Error processing knowledge query: {str(e)}"
         ) 
 
+@app.get("/tasks/{task_id}/knowledge/hints/stream", dependencies=[Depends(require_knowledge_base)])
+async def stream_knowledge_task_hints(task_id: int, db: AsyncSession = Depends(get_db), redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """Stream knowledge hints about a task as Server-Sent Events, as they are generated using RAG."""
+    task_information = hints_task_information(await get_task_fields(task_id, db, redis_client))
+    return await stream_knowledge_answer(redis_client, f"{task_information}. ", task_information=task_information)
+
     
-@app.post("/query", response_model=KnowledgeResponse)
-def query(query: KnowledgeQuery):
+async def stream_answer(redis_client: redis.asyncio.Redis, scope: str, question: str, generate_tokens, **info) -> StreamingResponse:
     """
-    Query the medieval fine-tuned LLM with general questions.
+    Stream the answer to a question as Server-Sent Events, from the answer caches or else as it is generated.
+
+    Args:
+        generate_tokens: Function of the question embedding (or None) returning an async generator of answer tokens
+        info: Extra fields of the `done` event
     """
     try:
-        ollama.host = settings.OLLAMA_HOST
-        
-        response = ollama.chat(
-            model=settings.OLLAMA_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": settings.SYSTEM_MESSAGES["knowledge_base"]
-                },
-                {
-                    "role": "user",
-                    "content": f"Answer the following question: {query.question}"
-                }
-            ]
+        answer = await get_cache(redis_client, answer_cache_key(scope, question))
+        vector = None
+        if answer is None:
+            answer, vector = await lookup_semantic_answer(redis_client, scope, question)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing query: {str(e)}"
         )
+    if answer is not None:
+        return sse_response(stream_cached_text(answer, **info))
+
+    async def store(answer):
+        await store_answer(redis_client, scope, question, answer, vector)
+
+    return sse_response(stream_tokens(generate_tokens(vector), store, **info))
+
+async def stream_knowledge_answer(redis_client: redis.asyncio.Redis, question: str, **info) -> StreamingResponse:
+    return await stream_answer(
+        redis_client,
+        knowledge_answer_scope(),
+        question,
+        lambda vector: rag_manager.stream_knowledge_base(question, query_vector=vector),
+        **info
+    )
+
+@app.post("/query", response_model=KnowledgeResponse)
+async def query(query: KnowledgeQuery, redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """
+    Query the medieval fine-tuned LLM with general questions.
+    """
+    async def generate(vector):
+        async with llm_slot():
+            start = time.perf_counter()
+            response = await async_ollama_client.chat(
+                model=settings.OLLAMA_MODEL,
+                messages=query_messages(query.question)
+            )
+            observe_generation("query", response, time.perf_counter() - start)
+        return response['message']['content']
 
-        answer = response['message']['content']
+    try:
+        answer = await get_or_generate_answer(redis_client, query_answer_scope(), query.question, generate)
         return KnowledgeResponse(answer=answer)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error processing query: {str(e)}"
         )     
-    
 
+@app.post("/query/stream")
+async def stream_query(query: KnowledgeQuery, redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """
+    Query the medieval fine-tuned LLM with general questions, streaming the answer as Server-Sent Events.
+    """
+    return await stream_answer(
+        redis_client,
+        query_answer_scope(),
+        query.question,
+        lambda vector: stream_chat(query_messages(query.question), operation="query")
+    )
 
-@app.post("/knowledge/query", response_model=KnowledgeResponse)
-def query_knowledge_base(query: KnowledgeQuery):
+
+@app.post("/knowledge/query", response_model=KnowledgeResponse, dependencies=[Depends(require_knowledge_base)])
+async def query_knowledge_base(query: KnowledgeQuery, redis_client: redis.asyncio.Redis = Depends(get_redis)):
     """
     Query the medieval fine-tuned LLM with general questions on: the knowledgebase using RAG with the local PDF/EPUB files.
     """
     try:
-        answer = rag_manager.query_knowledge_base(query.question)
+        answer = await get_or_generate_answer(
+            redis_client,
+            knowledge_answer_scope(),
+            query.question,
+            lambda vector: rag_manager.query_knowledge_base(query.question, query_vector=vector)
+        )
         return KnowledgeResponse(answer=answer)
     except Exception as e:
         raise HTTPException(
@@ -239,29 +742,93 @@ def query_knowledge_base(query: KnowledgeQuery):
             detail=f"Error processing knowledge query: {str(e)}"
         )     
     
-@app.get("/knowledge/documents", response_model=DocumentsResponse)
-def get_documents():
+@app.post("/knowledge/query/stream", dependencies=[Depends(require_knowledge_base)])
+async def stream_query_knowledge_base(query: KnowledgeQuery, redis_client: redis.asyncio.Redis = Depends(get_redis)):
     """
-    Retrieve all parsed document contents from the knowledge base.
+    Query the knowledge base using RAG with the local PDF/EPUB files, streaming the answer as Server-Sent Events.
     """
-    try:
+    return await stream_knowledge_answer(redis_client, query.question)
 
-        documents = rag_manager.get_all_documents()
+def document_content(doc, max_chars: Optional[int]) -> DocumentContent:
+    content = doc.page_content
+    truncated = max_chars is not None and len(content) > max_chars
+    return DocumentContent(
+        filename=doc.metadata.get('source', 'Unknown'),
+        content=content[:max_chars] if truncated else content,
+        metadata=doc.metadata,
+        truncated=truncated
+    )
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "").lower()
 
-        # Format the documents into the response schema
-        document_contents = []
+def gzip_chunks(chunks):
+    """Gzip a stream of byte chunks, flushing after each one so the client can decode as they arrive"""
+    compressor = zlib.compressobj(wbits=31)  # 31: gzip container
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def ndjson_documents(first, documents, max_chars: Optional[int]):
+    """
+    NDJSON lines of documents. Once the response has started, an error can no longer change its status,
+    so it is reported as a last line: {"error": "..."}.
+    """
+    try:
+        if first is not None:
+            yield json.dumps(document_content(first, max_chars).model_dump()).encode() + b"\n"
         for doc in documents:
-            document_content = DocumentContent(
-                filename=doc.metadata.get('source', 'Unknown'),
-                content=doc.page_content,
-                metadata=doc.metadata
-            )
-            document_contents.append(document_content)
-        
-        # Create and return the response
-        return DocumentsResponse(
-            documents=document_contents,
-            total_count=len(document_contents)
+            yield json.dumps(document_content(doc, max_chars).model_dump()).encode() + b"\n"
+    except Exception as e:
+        print(f"------------------------------ Error streaming document contents: {e}")
+        yield json.dumps({"error": f"Error retrieving document contents: {str(e)}"}).encode() + b"\n"
+
+@app.get("/knowledge/documents", response_model=DocumentsResponse, dependencies=[Depends(require_knowledge_base)])
+def get_documents(
+    request: Request,
+    offset: int = Query(0, ge=0, description="Number of documents to skip"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of documents to return"),
+    filename: Optional[str] = Query(None, description="Only return the documents of the file with this path or name"),
+    max_chars: Optional[int] = Query(None, ge=0, description="Truncate the content of every document to this many characters"),
+    output_format: Literal["json", "ndjson"] = Query("json", alias="format")
+):
+    """
+    Retrieve parsed document contents from the knowledge base, a page at a time.
+
+    Documents are read from the persisted index on demand rather than kept in memory. With format=ndjson the
+    page is streamed one document per line. Responses are gzip-compressed when the client accepts it.
+    """
+    headers = {"Vary": "Accept-Encoding"}
+    gzip_response = accepts_gzip(request)
+    if gzip_response:
+        headers["Content-Encoding"] = "gzip"
+
+    try:
+        if output_format == "ndjson":
+            documents = rag_manager.iter_documents(offset, limit, filename)
+            # Read the first document before responding, so documents pruned by a rescan still get a 503
+            first = next(documents, None)
+            lines = ndjson_documents(first, documents, max_chars)
+            return StreamingResponse(gzip_chunks(lines) if gzip_response else lines, media_type="application/x-ndjson", headers=headers)
+
+        documents = [document_content(doc, max_chars) for doc in rag_manager.iter_documents(offset, limit, filename)]
+        total_count = rag_manager.count_documents(filename)
+        next_offset = offset + len(documents)
+        body = DocumentsResponse(
+            documents=documents,
+            total_count=total_count,
+            offset=offset,
+            next_offset=next_offset if next_offset < total_count else None
+        ).model_dump_json().encode()
+        if gzip_response:
+            body = gzip.compress(body, compresslevel=6)
+        return Response(content=body, media_type="application/json", headers=headers)
+    except FileNotFoundError:
+        # The documents were pruned by a rescan and their replacement is not readable yet
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Knowledge base documents changed during the request, retry",
+            headers={"Retry-After": "1"}
         )
     except Exception as e:
         raise HTTPException(
@@ -269,3 +836,48 @@ def get_documents():
             detail=f"Error retrieving document contents: {str(e)}"
         )
 
+
+@app.post("/admin/knowledge/rescan", response_model=KnowledgeRescanResponse)
+def rescan_knowledge_base():
+    """
+    Rescan the data directory and ingest only the PDF/EPUB files that were added, changed or removed.
+    """
+    try:
+        return KnowledgeRescanResponse(**rag_manager.rescan_knowledge_base())
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error rescanning knowledge base: {str(e)}"
+        )
+
+
+@app.get("/knowledge/status", response_model=KnowledgeStatus)
+async def get_knowledge_status():
+    """
+    Report whether the knowledge base index is ready and the progress of a running build.
+    """
+    if rag_manager.has_new_generation:
+        await asyncio.to_thread(rag_manager.refresh)
+    return KnowledgeStatus(**rag_manager.get_status())
+
+
+@app.get("/cache/stats", response_model=CacheStats)
+async def cache_stats(redis_client: redis.asyncio.Redis = Depends(get_redis)):
+    """
+    Report key counts, estimated memory and hit/miss counts per cache namespace, and the state of the in-process tier.
+    """
+    try:
+        return CacheStats(prefix=settings.REDIS_KEY_PREFIX, namespaces=await get_cache_stats(redis_client), local=local_cache.stats())
+    except redis.RedisError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Redis is unavailable: {str(e)}"
+        )
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Prometheus metrics: request latency per route, database statement time, cache hits/misses and Redis
+    latency, and the embedding, retrieval and generation time and token counts of LLM requests.
+    """
+    return Response(content=latest_metrics(), media_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,116 @@
+"""
+Prometheus metrics of the API, exposed by GET /metrics
+
+Set PROMETHEUS_MULTIPROC_DIR to aggregate the metrics of several worker processes.
+"""
+import os
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+# Buckets from a cache hit to a long LLM generation
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+REQUEST_LATENCY = Histogram(
+    "taskapi_request_duration_seconds",
+    "Time to respond to HTTP requests (to the first byte for streamed responses), per route",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+DB_QUERY_LATENCY = Histogram(
+    "taskapi_db_query_duration_seconds",
+    "Time spent executing database statements, per statement type",
+    ["operation"],
+    buckets=LATENCY_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    "taskapi_cache_lookups_total",
+    "Cache lookups per key namespace and result (hit or miss)",
+    ["namespace", "result"]
+)
+REDIS_LATENCY = Histogram(
+    "taskapi_redis_command_duration_seconds",
+    "Round-trip time of Redis commands and pipelines issued by the cache",
+    ["command"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_STAGE_LATENCY = Histogram(
+    "taskapi_llm_stage_duration_seconds",
+    "Time spent per stage (embedding, retrieval, generation) of LLM requests, per operation (summary, query, knowledge)",
+    ["operation", "stage"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter(
+    "taskapi_llm_tokens_total",
+    "Tokens processed by the LLM per operation, as reported by Ollama (prompt or completion)",
+    ["operation", "kind"]
+)
+
+class RequestLatencyMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request under its route template, e.g. /tasks/{task_id}
+
+    A plain ASGI middleware rather than an @app.middleware("http") one, which would put a task group and
+    a memory stream in front of every response and between streamed responses and disconnect handling.
+    The latency is measured to the start of the response, i.e. to the first byte of streamed responses.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        observed = False
+
+        def observe(status_code):
+            nonlocal observed
+            observed = True
+            # The router records the matched route in the scope
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=status_code
+            ).observe(time.perf_counter() - start)
+
+        async def send_observed(message):
+            if message["type"] == "http.response.start":
+                observe(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_observed)
+        finally:
+            if not observed:
+                observe(500)
+
+def observe_generation(operation: str, response, seconds: float):
+    """Record the duration and the token counts of an LLM generation from its (final) Ollama response"""
+    LLM_STAGE_LATENCY.labels(operation=operation, stage="generation").observe(seconds)
+    LLM_TOKENS.labels(operation=operation, kind="prompt").inc(response.get("prompt_eval_count") or 0)
+    LLM_TOKENS.labels(operation=operation, kind="completion").inc(response.get("eval_count") or 0)
+
+def instrument_engine(engine):
+    """Record the execution time of every statement run on a (sync) SQLAlchemy engine"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start_time = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        DB_QUERY_LATENCY.labels(operation=operation).observe(time.perf_counter() - context._query_start_time)
+
+def latest_metrics() -> bytes:
+    """Metrics in the Prometheus text format, of all workers if PROMETHEUS_MULTIPROC_DIR is set"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text
+from sqlalchemy import Column, Integer, String, Float, Text, Index
 from sqlalchemy.sql import func
 import time
 
@@ -13,4 +13,11 @@ class Task(Base):
     description = Column(Text, nullable=False)
     status = Column(String, default="Pending")
     createdAt = Column(Float, default=time.time)
-    updatedAt = Column(Float, default=time.time) 
\ No newline at end of file
+    updatedAt = Column(Float, default=time.time)
+
+    __table_args__ = (
+        # Keyset pagination of GET /tasks: by id or updatedAt, optionally filtered on status
+        Index("ix_tasks_status_id", "status", "id"),
+        Index("ix_tasks_updatedAt_id", "updatedAt", "id"),
+        Index("ix_tasks_status_updatedAt_id", "status", "updatedAt", "id"),
+    )
@@ -1,103 +1,768 @@
 import os
 import glob
-from typing import List
-from langchain_community.document_loaders import PyPDFLoader, UnstructuredEPubLoader
+import asyncio
+import json
+import uuid
+import fcntl
+import shutil
+import hashlib
+import tempfile
+import time
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+import faiss
+import numpy as np
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OllamaEmbeddings
-from settings import settings
-from langchain.chains import RetrievalQA
-from langchain.llms import Ollama
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain.chains.retrieval_qa.prompt import PROMPT
 from langchain.schema import Document
+from settings import settings
+from loaders import load_file_documents
+from metrics import LLM_STAGE_LATENCY, observe_generation
+from llm import create_embeddings, async_ollama_client, llm_slot, stream_generate
+from retrieval import INDEX_TYPES, KeywordIndex, all_vectors, assemble_context, build_faiss_index, configure_search, faiss_index_type, reciprocal_rank_fusion
+
+# Bump whenever the on-disk layout of a persisted index changes
+INDEX_FORMAT_VERSION = 3
+
+EMPTY_KNOWLEDGE_BASE_ANSWER = "Knowledge base is not initialized or empty."
+
+
+def _file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    """Compute the SHA-256 hex digest of a file without reading it into memory at once"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class KnowledgeIndex:
+    """One generation of the knowledge base: its vector store, keyword index and manifest (parsed documents stay on disk)"""
+
+    def __init__(self, manifest: Dict, vector_store: Optional[FAISS] = None, keyword_index: Optional[KeywordIndex] = None):
+        self.manifest = manifest
+        self.vector_store = vector_store
+        self.keyword_index = keyword_index or KeywordIndex()
+
+    @property
+    def generation(self) -> str:
+        return f"gen-{self.manifest['generation']:06d}"
+
+    def copy(self) -> "KnowledgeIndex":
+        """Copy the index so it can be updated while this one keeps serving queries"""
+        vector_store = None
+        if self.vector_store is not None:
+            vector_store = FAISS(
+                self.vector_store.embedding_function,
+                faiss.clone_index(self.vector_store.index),
+                InMemoryDocstore(dict(self.vector_store.docstore._dict)),
+                dict(self.vector_store.index_to_docstore_id),
+            )
+        manifest = dict(self.manifest, files=dict(self.manifest["files"]))
+        return KnowledgeIndex(manifest, vector_store, self.keyword_index.copy())
+
 
 class RAGManager:
     def __init__(self):
-        self.vector_store = None
-        self.documents = []
-        self.ollama_embeddings = OllamaEmbeddings(
-            base_url=settings.OLLAMA_HOST,
-            model=settings.OLLAMA_MODEL
+        self.index: Optional[KnowledgeIndex] = None
+        self.status = "idle"
+        self.error = None
+        self.progress = {}
+        self.ingestion_stats = {}
+        self.ollama_embeddings = create_embeddings()
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.RAG_CHUNK_SIZE,
+            chunk_overlap=settings.RAG_CHUNK_OVERLAP
         )
+        self._rescan_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._index_lease = None
+        self._initialization_thread = None
+
+    @property
+    def vector_store(self) -> Optional[FAISS]:
+        return self.index.vector_store if self.index else None
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether an index has been loaded or built and queries can be served"""
+        return self.index is not None
+
+    @property
+    def index_key(self) -> str:
+        """Key of the persisted index: everything except the corpus that affects the stored vectors"""
+        inputs = {
+            "version": INDEX_FORMAT_VERSION,
+            "chunk_size": settings.RAG_CHUNK_SIZE,
+            "chunk_overlap": settings.RAG_CHUNK_OVERLAP,
+            "embedding_model": self.ollama_embeddings.model,
+        }
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()[:16]
+
+    @property
+    def index_root(self) -> str:
+        return os.path.join(settings.RAG_INDEX_DIR, self.index_key)
+
+    def _empty_manifest(self) -> Dict:
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "key": self.index_key,
+            "generation": 0,
+            "chunk_size": settings.RAG_CHUNK_SIZE,
+            "chunk_overlap": settings.RAG_CHUNK_OVERLAP,
+            "embedding_model": self.ollama_embeddings.model,
+            "files": {},
+        }
+
+    @contextmanager
+    def _index_lock(self, exclusive: bool, blocking: bool = True):
+        """
+        Lock the persisted index against other workers (shared for reads, exclusive for updates)
         
-        self.initialize_knowledge_base()
+        Raises:
+            BlockingIOError: If not blocking and another worker holds a conflicting lock
+        """
+        os.makedirs(self.index_root, exist_ok=True)
+        with open(os.path.join(self.index_root, ".lock"), "a+") as lock_file:
+            fcntl.flock(lock_file, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if blocking else fcntl.LOCK_NB))
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _list_corpus_files(self) -> List[str]:
+        """List the PDF and EPUB files of the data directory in a stable order"""
+        files = []
+        for pattern in ("**/*.pdf", "**/*.epub"):
+            files.extend(glob.glob(os.path.join(settings.DATA_DIR, pattern), recursive=True))
+        return sorted(files)
 
-    def initialize_knowledge_base(self):
-        """Initialize the knowledge base with documents from the data directory"""
+    def _current_generation(self) -> Optional[str]:
+        """Name of the published generation of the persisted index, if any"""
         try:
-            # PDF files
-            pdf_files = glob.glob(os.path.join(settings.DATA_DIR, "**/*.pdf"), recursive=True)
-            for pdf_file in pdf_files:
-                try:
-                    loader = PyPDFLoader(pdf_file)
-                    self.documents.extend(loader.load())
-                    print(f"------------------------------ Loaded PDF: {pdf_file}")
-                except Exception as e:
-                    print(f"Error loading PDF {pdf_file}: {e}")
+            with open(os.path.join(self.index_root, "CURRENT"), encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _load_index(self) -> KnowledgeIndex:
+        """Load the current generation of the persisted index, or start from an empty one"""
+        generation = self._current_generation()
+        if generation is None:
+            return KnowledgeIndex(self._empty_manifest())
+        
+        try:
+            generation_path = os.path.join(self.index_root, generation)
+            with open(os.path.join(generation_path, "manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
             
-            # EPUB files
-            epub_files = glob.glob(os.path.join(settings.DATA_DIR, "**/*.epub"), recursive=True)
-            for epub_file in epub_files:
-                try:
-                    loader = UnstructuredEPubLoader(epub_file)
-                    self.documents.extend(loader.load())
-                    print(f"------------------------------ Loaded EPUB: {epub_file}")
-                except Exception as e:
-                    print(f"------------------------------ Error loading EPUB {epub_file}: {e}")
+            vector_store = None
+            if any(entry["chunk_ids"] for entry in manifest["files"].values()):
+                vector_store = FAISS.load_local(generation_path, self.ollama_embeddings)
+                configure_search(vector_store.index, settings.RAG_IVF_PROBES, settings.RAG_HNSW_EF_SEARCH)
             
-            # Split the documents into chunks
-            if self.documents:
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=settings.RAG_CHUNK_SIZE,
-                    chunk_overlap=settings.RAG_CHUNK_OVERLAP
-                )
-                chunks = text_splitter.split_documents(self.documents)
-                
-                # Create vector store
-                self.vector_store = FAISS.from_documents(chunks, self.ollama_embeddings)
-                print(f"------------------------------ Created vector store with {len(chunks)} chunks from {len(self.documents)} documents")
+            keyword_index_path = os.path.join(generation_path, "keyword_index.json")
+            if os.path.exists(keyword_index_path):
+                with open(keyword_index_path, encoding="utf-8") as f:
+                    keyword_index = KeywordIndex(json.load(f))
             else:
-                print("No documents found in the data directory")
+                # Generations persisted before the keyword index existed: index the stored chunks
+                keyword_index = KeywordIndex()
+                for chunk_id, chunk in (vector_store.docstore._dict.items() if vector_store else []):
+                    keyword_index.add(chunk_id, chunk.page_content)
+            return KnowledgeIndex(manifest, vector_store, keyword_index)
         except Exception as e:
-            print(f"Error initializing knowledge base: {e}")
+            print(f"------------------------------ Error loading persisted index {self.index_root}: {e}")
+            return KnowledgeIndex(self._empty_manifest())
+
+    def _swap_index(self, index: Optional[KnowledgeIndex]):
+        """
+        Serve another index, leasing its generation
+        
+        A worker holds a shared lock on the manifest of the generation it serves, so other workers do not
+        prune that generation or its parsed documents until it has swapped to a newer one. Must be called
+        while holding the index lock, so the generation cannot be pruned before it is leased.
+        """
+        lease = None
+        if index is not None and index.manifest["generation"]:
+            lease = open(os.path.join(self.index_root, index.generation, "manifest.json"), "rb")
+            fcntl.flock(lease, fcntl.LOCK_SH)
+        self.index, previous_lease = index, self._index_lease
+        self._index_lease = lease
+        if previous_lease is not None:
+            previous_lease.close()
 
-    def query_knowledge_base(self, query):
-        """Query the knowledge base"""
-        if not self.vector_store:
-            return "Knowledge base is not initialized or empty."
+    @property
+    def has_new_generation(self) -> bool:
+        """Whether another worker published a generation this worker does not serve yet (reads one small file)"""
+        generation = self._current_generation()
+        return generation is not None and (self.index is None or generation != self.index.generation)
+
+    def refresh(self, wait: bool = False) -> bool:
+        """
+        Swap in the generation another worker published, if any
         
+        Unless waiting, never waits for a rescan: if one holds the index lock, or another request of this
+        worker is already loading the generation, the loaded index keeps serving and a later request swaps.
+        
+        Args:
+            wait: Wait for a running rescan or load instead
+        
+        Returns:
+            Whether a new generation was swapped in
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return False
         try:
-            # Create retriever
-            retriever = self.vector_store.as_retriever(
-                search_type="similarity",
-                search_kwargs={"k": settings.RAG_TOP_K_RESULTS}
-            )
-            
-            # Create QA chain
-            qa = RetrievalQA.from_chain_type(
-                llm=Ollama(base_url=settings.OLLAMA_HOST, model=settings.OLLAMA_MODEL, system=settings.SYSTEM_MESSAGES["knowledge_base"]),
-                chain_type="stuff",
-                retriever=retriever,
-                return_source_documents=False
-            )
+            with self._index_lock(exclusive=False, blocking=wait):
+                if not self.has_new_generation:
+                    return False
+                index = self._load_index()
+                if not index.manifest["generation"]:
+                    return False
+                self._swap_index(index)
+            print(f"------------------------------ Loaded index {self.index_key} generation {index.manifest['generation']} published by another worker")
+            return True
+        except BlockingIOError:
+            return False
+        finally:
+            self._refresh_lock.release()
+
+    def _save_index(self, index: KnowledgeIndex):
+        """
+        Persist the index as a new generation
+        
+        The generation is written to a temporary directory, renamed into place and then published by
+        atomically replacing the CURRENT pointer, so readers never see a partially written index.
+        """
+        index.manifest["generation"] += 1
+        generation = index.generation
+        
+        tmp_path = tempfile.mkdtemp(prefix=f".{generation}-", dir=self.index_root)
+        if index.vector_store:
+            index.vector_store.save_local(tmp_path)
+        with open(os.path.join(tmp_path, "keyword_index.json"), "w", encoding="utf-8") as f:
+            json.dump(index.keyword_index.chunk_terms, f)
+        with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(index.manifest, f, indent=2)
+        os.rename(tmp_path, os.path.join(self.index_root, generation))
+        
+        with open(os.path.join(self.index_root, "CURRENT.tmp"), "w", encoding="utf-8") as f:
+            f.write(generation)
+        os.replace(os.path.join(self.index_root, "CURRENT.tmp"), os.path.join(self.index_root, "CURRENT"))
+
+    def _save_file_documents(self, documents: List[Document]) -> str:
+        """Store the parsed documents of a file, returning the name of the stored file"""
+        documents_dir = os.path.join(self.index_root, "documents")
+        os.makedirs(documents_dir, exist_ok=True)
+        name = f"{uuid.uuid4().hex}.jsonl"
+        with open(os.path.join(documents_dir, name), "w", encoding="utf-8") as f:
+            for doc in documents:
+                f.write(json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}) + "\n")
+        return name
+
+    @staticmethod
+    def _generation_in_use(generation_path: str) -> bool:
+        """Whether a worker still serves a generation, i.e. holds a lease on its manifest (see _swap_index)"""
+        try:
+            with open(os.path.join(generation_path, "manifest.json"), "rb") as f:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        except FileNotFoundError:
+            pass
+        return False
+
+    def _prune_index(self, index: KnowledgeIndex):
+        """
+        Remove older generations, unreferenced parsed documents and indexes built with other settings
+        
+        Generations other workers still serve are kept, with their parsed documents, and removed by a
+        later rescan once those workers have swapped to a newer generation.
+        """
+        for name in os.listdir(settings.RAG_INDEX_DIR):
+            if name != self.index_key:
+                shutil.rmtree(os.path.join(settings.RAG_INDEX_DIR, name), ignore_errors=True)
+        
+        referenced = {entry["documents"] for entry in index.manifest["files"].values()}
+        for name in os.listdir(self.index_root):
+            if not name.startswith("gen-") or name == index.generation:
+                continue
+            generation_path = os.path.join(self.index_root, name)
+            if self._generation_in_use(generation_path):
+                with open(os.path.join(generation_path, "manifest.json"), encoding="utf-8") as f:
+                    referenced.update(entry["documents"] for entry in json.load(f)["files"].values())
+                continue
+            shutil.rmtree(generation_path, ignore_errors=True)
+        
+        documents_dir = os.path.join(self.index_root, "documents")
+        for name in os.listdir(documents_dir) if os.path.isdir(documents_dir) else []:
+            if name not in referenced:
+                os.remove(os.path.join(documents_dir, name))
+
+    def start_background_initialization(self):
+        """Initialize the knowledge base in a daemon thread so the API can serve requests meanwhile"""
+        if self._initialization_thread is not None and self._initialization_thread.is_alive():
+            return
+        
+        self._initialization_thread = threading.Thread(
+            target=self._initialize_until_ready,
+            name="knowledge-base-initialization",
+            daemon=True
+        )
+        self._initialization_thread.start()
+
+    def _initialize_until_ready(self):
+        """Initialize the knowledge base, retrying with exponential backoff until it succeeds"""
+        delay = settings.RAG_BUILD_RETRY_INITIAL
+        while not self.initialize_knowledge_base():
+            print(f"------------------------------ Retrying the knowledge base build in {delay:.0f}s")
+            time.sleep(delay)
+            delay = min(delay * 2, settings.RAG_BUILD_RETRY_MAX)
+
+    def initialize_knowledge_base(self) -> bool:
+        """
+        Initialize the knowledge base from the persisted index and ingest whatever changed since
+        
+        Queries are served from the persisted index as soon as it is loaded; the rescanned index is
+        swapped in once it is complete. A failure is kept in the status until an attempt succeeds.
+        
+        Returns:
+            Whether the knowledge base was initialized
+        """
+        if self.status != "failed":
+            self.status = "warming"
+        try:
+            with self._index_lock(exclusive=False):
+                index = self._load_index()
+                if index.manifest["generation"]:
+                    self._swap_index(index)
+            print(f"------------------------------ Loaded persisted index {self.index_key} generation {index.manifest['generation']} with {len(index.manifest['files'])} files")
             
-            # Run the query
-            result = qa.run(query)
-            return result
+            self.rescan_knowledge_base()
+            self.status = "ready"
+            self.error = None
+            return True
         except Exception as e:
-            print(f"Error querying knowledge base: {e}")
-            return f"Error querying knowledge base: {str(e)}"
-    
-    def get_all_documents(self) -> List[Document]:
+            self.status = "failed"
+            self.error = str(e)
+            print(f"Error initializing knowledge base: {e}")
+            return False
+
+    def get_status(self) -> Dict:
+        """Readiness of the knowledge base and progress of the running build, if any"""
+        return {
+            "status": self.status,
+            "ready": self.is_ready,
+            "rebuilding": self._rescan_lock.locked(),
+            "generation": self.index.manifest["generation"] if self.index else None,
+            "files": len(self.index.manifest["files"]) if self.index else 0,
+            "progress": self.progress,
+            "ingestion": self.ingestion_stats,
+            "error": self.error,
+        }
+
+    def rescan_knowledge_base(self) -> Dict:
         """
-        Retrieve all documents from the knowledge base
+        Bring the index up to date with the data directory
+        
+        Files are compared to the manifest by size and mtime first and by content hash only when those
+        differ, so only new or changed files are parsed and embedded and only the vectors of changed or
+        deleted files are removed. Changed files go through a streaming pipeline: parsing in a process pool,
+        splitting into chunks and embedding in bounded concurrent batches.
+        
+        The update is applied to a copy of the live index, which keeps serving queries until the new
+        index is published and swapped in.
         
         Returns:
-            List of Document objects containing all parsed documents
+            Dict with the added, updated and removed file paths, the unchanged file count, the embedded/removed
+            chunk counts and the ingestion timings and throughput
         """
-        if not self.documents:
+        with self._rescan_lock, self._index_lock(exclusive=True):
+            self.progress = {"stage": "scanning"}
+            
+            # Another worker may have published a newer generation in the meantime
+            if self.index is None or self._current_generation() != self.index.generation:
+                self._swap_index(self._load_index() if self._current_generation() else None)
+            index = self.index.copy() if self.index else KnowledgeIndex(self._empty_manifest())
+            
+            previous = index.manifest["files"]
+            current = {}
+            added, updated, unchanged = [], [], []
+            for path in self._list_corpus_files():
+                rel_path = os.path.relpath(path, settings.DATA_DIR)
+                stat = os.stat(path)
+                entry = previous.get(rel_path)
+                if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                    current[rel_path] = entry
+                    unchanged.append(rel_path)
+                    continue
+                
+                sha256 = _file_sha256(path)
+                if entry and entry["sha256"] == sha256:
+                    current[rel_path] = dict(entry, size=stat.st_size, mtime=stat.st_mtime)
+                    unchanged.append(rel_path)
+                    continue
+                
+                (updated if entry else added).append(rel_path)
+                current[rel_path] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": sha256}
+            removed = [rel_path for rel_path in previous if rel_path not in current]
+            
+            # Per-stage seconds are the time the pipeline spent waiting on that stage, so the largest one is the bottleneck
+            timings = {"parse_seconds": 0.0, "split_seconds": 0.0, "embed_seconds": 0.0}
+            started = time.perf_counter()
+            self.progress = {"stage": "ingesting", "files_total": len(added) + len(updated), "files_parsed": 0, "chunks_embedded": 0}
+            try:
+                # Remove the vectors of changed and deleted files
+                stale_ids = [chunk_id for rel_path in updated + removed for chunk_id in previous[rel_path]["chunk_ids"]]
+                if stale_ids:
+                    if faiss_index_type(index.vector_store.index) == "flat":
+                        index.vector_store.delete(stale_ids)
+                    else:
+                        # Approximate indexes cannot remove vectors in place (hnsw) or keep their ids when they do (ivf)
+                        index.vector_store = self._rebuild_vector_store(index.vector_store, faiss_index_type(index.vector_store.index), set(stale_ids))
+                    index.keyword_index.delete(stale_ids)
+                
+                # Parse, split and embed only the new and changed files
+                chunks = self._iter_chunks(index, self._parse_files(added + updated, current, timings), current, timings)
+                embedded_chunks = 0
+                for batch, vectors in self._embed_batches(chunks, timings):
+                    self._add_embeddings(index, batch, vectors)
+                    embedded_chunks += len(batch)
+                    self.progress["chunks_embedded"] = embedded_chunks
+                
+                converted = self._convert_vector_store(index)
+                
+                index.manifest["files"] = current
+                saved = current != previous or converted or self.index is None
+                if saved:
+                    self.progress["stage"] = "saving"
+                    self._save_index(index)
+            finally:
+                self.progress = {}
+            
+            # Atomically swap the updated index in, then prune what no worker serves any more
+            self._swap_index(index)
+            if saved:
+                self._prune_index(index)
+            
+            timings["total_seconds"] = time.perf_counter() - started
+            ingested_files = [rel_path for rel_path in added + updated if rel_path in current]
+            self.ingestion_stats = {
+                **timings,
+                "files": len(ingested_files),
+                "chunks": embedded_chunks,
+                "files_per_second": len(ingested_files) / timings["total_seconds"],
+                "chunks_per_second": embedded_chunks / timings["total_seconds"],
+            }
+            
+            stats = {
+                "added": [rel_path for rel_path in added if rel_path in current],
+                "updated": [rel_path for rel_path in updated if rel_path in current],
+                "removed": removed,
+                "unchanged": len(unchanged),
+                "embedded_chunks": embedded_chunks,
+                "removed_chunks": len(stale_ids),
+                "generation": index.manifest["generation"],
+                "ingestion": self.ingestion_stats,
+            }
+            print(f"------------------------------ Rescanned knowledge base: {len(stats['added'])} added, {len(stats['updated'])} updated, {len(removed)} removed, {len(unchanged)} unchanged files; {embedded_chunks} chunks embedded, {len(stale_ids)} removed")
+            print(f"------------------------------ Ingestion timings: {self.ingestion_stats}")
+            return stats
+
+    def _parse_files(self, rel_paths: List[str], current: Dict, timings: Dict) -> Iterator[Tuple[str, List[Document]]]:
+        """
+        Stage 1: parse files in a process pool, yielding (relative path, documents) as each file completes
+        
+        At most twice RAG_INGEST_WORKERS files are submitted at a time, more as parsed files are consumed,
+        and a file's documents are released once handed on, so memory is bounded by the files in flight
+        rather than by the corpus. Files that fail to parse are dropped from the manifest, so they are
+        retried on the next rescan.
+        """
+        if not rel_paths:
+            return
+        
+        workers = min(settings.RAG_INGEST_WORKERS, len(rel_paths))
+        pending_paths = iter(rel_paths)
+        # Spawned rather than forked workers: the API process runs other threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = {}
+            
+            def submit_more():
+                for rel_path in islice(pending_paths, 2 * workers - len(futures)):
+                    futures[executor.submit(load_file_documents, os.path.join(settings.DATA_DIR, rel_path))] = rel_path
+            
+            submit_more()
+            while futures:
+                waited = time.perf_counter()
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                timings["parse_seconds"] += time.perf_counter() - waited
+                for future in done:
+                    rel_path = futures.pop(future)
+                    path = os.path.join(settings.DATA_DIR, rel_path)
+                    self.progress["files_parsed"] += 1
+                    try:
+                        documents = future.result()
+                    except Exception as e:
+                        print(f"------------------------------ Error loading {path}: {e}")
+                        del current[rel_path]
+                        continue
+                    print(f"------------------------------ Loaded {os.path.splitext(path)[1][1:].upper()}: {path}")
+                    submit_more()
+                    yield rel_path, documents
+                submit_more()
+
+    def _iter_chunks(self, index: KnowledgeIndex, parsed_files: Iterator[Tuple[str, List[Document]]], current: Dict, timings: Dict) -> Iterator[Tuple[str, Document]]:
+        """Stage 2: split parsed files into chunks, yielding (chunk id, chunk) and recording each file in the manifest"""
+        for rel_path, documents in parsed_files:
+            started = time.perf_counter()
+            chunks = self.text_splitter.split_documents(documents)
+            chunk_ids = [uuid.uuid4().hex for _ in chunks]
+            current[rel_path].update(chunk_ids=chunk_ids, documents=self._save_file_documents(documents), pages=len(documents))
+            timings["split_seconds"] += time.perf_counter() - started
+            
+            yield from zip(chunk_ids, chunks)
+
+    def _embed_batches(self, chunks: Iterator[Tuple[str, Document]], timings: Dict) -> Iterator[Tuple[List[Tuple[str, Document]], List[List[float]]]]:
+        """
+        Stage 3: embed chunks in batches of RAG_EMBEDDING_BATCH_SIZE
+        
+        At most RAG_EMBEDDING_CONCURRENCY batches are in flight to the embedding server at a time;
+        batches are yielded with their vectors in submission order.
+        """
+        with ThreadPoolExecutor(max_workers=settings.RAG_EMBEDDING_CONCURRENCY) as executor:
+            pending = deque()
+            batches = iter(lambda: list(islice(chunks, settings.RAG_EMBEDDING_BATCH_SIZE)), [])
+            for batch in batches:
+                texts = [chunk.page_content for _, chunk in batch]
+                pending.append((batch, executor.submit(self.ollama_embeddings.embed_documents, texts)))
+                if len(pending) >= settings.RAG_EMBEDDING_CONCURRENCY:
+                    yield self._wait_for_batch(pending.popleft(), timings)
+            while pending:
+                yield self._wait_for_batch(pending.popleft(), timings)
+
+    @staticmethod
+    def _wait_for_batch(pending_batch, timings: Dict):
+        batch, future = pending_batch
+        started = time.perf_counter()
+        vectors = future.result()
+        timings["embed_seconds"] += time.perf_counter() - started
+        return batch, vectors
+
+    def _add_embeddings(self, index: KnowledgeIndex, batch: List[Tuple[str, Document]], vectors: List[List[float]]):
+        """Add an embedded batch of chunks to the vector store and the keyword index"""
+        text_embeddings = [(chunk.page_content, vector) for (_, chunk), vector in zip(batch, vectors)]
+        metadatas = [chunk.metadata for _, chunk in batch]
+        ids = [chunk_id for chunk_id, _ in batch]
+        if index.vector_store is None:
+            index.vector_store = FAISS.from_embeddings(text_embeddings, self.ollama_embeddings, metadatas=metadatas, ids=ids)
+        else:
+            index.vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        for chunk_id, chunk in batch:
+            index.keyword_index.add(chunk_id, chunk.page_content)
+
+    @staticmethod
+    def _rebuild_vector_store(vector_store: FAISS, index_type: str, drop_ids=frozenset()) -> Optional[FAISS]:
+        """Copy a vector store into a new FAISS index of the given type, without the chunks of drop_ids"""
+        keep = [(position, chunk_id) for position, chunk_id in sorted(vector_store.index_to_docstore_id.items()) if chunk_id not in drop_ids]
+        if not keep:
+            return None
+        
+        vectors = all_vectors(vector_store.index)[[position for position, _ in keep]]
+        faiss_index = build_faiss_index(index_type, vectors, settings.RAG_IVF_LISTS, settings.RAG_HNSW_NEIGHBORS)
+        configure_search(faiss_index, settings.RAG_IVF_PROBES, settings.RAG_HNSW_EF_SEARCH)
+        return FAISS(
+            vector_store.embedding_function,
+            faiss_index,
+            InMemoryDocstore({chunk_id: vector_store.docstore._dict[chunk_id] for _, chunk_id in keep}),
+            {position: chunk_id for position, (_, chunk_id) in enumerate(keep)},
+        )
+
+    def _convert_vector_store(self, index: KnowledgeIndex) -> bool:
+        """
+        Switch the vector store to the configured FAISS index type
+        
+        Approximate types (RAG_FAISS_INDEX_TYPE) are used from RAG_ANN_MIN_VECTORS vectors on; smaller
+        corpora keep the exact flat index. The vectors are copied, so nothing is embedded again.
+        
+        Returns:
+            Whether the vector store was converted
+        """
+        if settings.RAG_FAISS_INDEX_TYPE not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type {settings.RAG_FAISS_INDEX_TYPE!r}. Must be one of: {', '.join(INDEX_TYPES)}")
+        if index.vector_store is None:
+            return False
+        
+        index_type = settings.RAG_FAISS_INDEX_TYPE if index.vector_store.index.ntotal >= settings.RAG_ANN_MIN_VECTORS else "flat"
+        if faiss_index_type(index.vector_store.index) == index_type:
+            return False
+        
+        self.progress["stage"] = "indexing"
+        index.vector_store = self._rebuild_vector_store(index.vector_store, index_type)
+        print(f"------------------------------ Converted the vector store to a {index_type} index of {index.vector_store.index.ntotal} vectors")
+        return True
+
+    def _retrieve(self, index: KnowledgeIndex, query: str, query_vector: List[float]) -> List[Document]:
+        """
+        Rank chunks for a question by fusing the vector search and BM25 keyword search results
+        
+        Returns:
+            The chunks found by either search, best first
+        """
+        vector_store = index.vector_store
+        candidates = max(settings.RAG_CANDIDATES, settings.RAG_TOP_K_RESULTS)
+        _, positions = vector_store.index.search(np.array([query_vector], dtype=np.float32), candidates)
+        rankings = [[vector_store.index_to_docstore_id[position] for position in positions[0] if position != -1]]
+        if settings.RAG_HYBRID_SEARCH:
+            rankings.append([chunk_id for chunk_id, _ in index.keyword_index.search(query, candidates)])
+        chunk_ids = reciprocal_rank_fusion(rankings, settings.RAG_RRF_K)
+        return [vector_store.docstore.search(chunk_id) for chunk_id in chunk_ids]
+
+    async def _build_prompt(self, query, query_vector=None):
+        """
+        Retrieve the chunks for a question and "stuff" them into the RetrievalQA prompt
+        
+        Chunks are ranked by hybrid (vector and keyword) search, then the best RAG_TOP_K_RESULTS are packed
+        into the RAG_CONTEXT_TOKENS budget without the text neighbouring chunks share.
+        
+        Returns:
+            The prompt, or None if the knowledge base is empty
+        """
+        index = self.index
+        if not index or not index.vector_store:
+            return None
+        
+        if query_vector is None:
+            with LLM_STAGE_LATENCY.labels(operation="knowledge", stage="embedding").time():
+                query_vector = await self.ollama_embeddings.aembed_query(query)
+        with LLM_STAGE_LATENCY.labels(operation="knowledge", stage="retrieval").time():
+            documents = await asyncio.to_thread(self._retrieve, index, query, query_vector)
+        passages = assemble_context(documents, settings.RAG_CONTEXT_TOKENS, settings.RAG_TOP_K_RESULTS, settings.RAG_CHUNK_OVERLAP)
+        return PROMPT.format(
+            context="\n\n".join(passages),
+            question=query
+        )
+    
+    async def query_knowledge_base(self, query, query_vector=None):
+        """
+        Query the knowledge base
+        
+        Generates the answer through the shared, pooled Ollama client rather than a chain and LLM object
+        built per query.
+        
+        Args:
+            query: Question to answer
+            query_vector: Embedding of the question, if the caller already computed it
+        """
+        prompt = await self._build_prompt(query, query_vector)
+        if prompt is None:
+            return EMPTY_KNOWLEDGE_BASE_ANSWER
+        
+        async with llm_slot():
+            start = time.perf_counter()
+            response = await async_ollama_client.generate(
+                model=settings.OLLAMA_MODEL,
+                prompt=prompt,
+                system=settings.SYSTEM_MESSAGES["knowledge_base"]
+            )
+            observe_generation("knowledge", response, time.perf_counter() - start)
+        return response["response"]
+    
+    async def stream_knowledge_base(self, query, query_vector=None):
+        """
+        Query the knowledge base, yielding the answer tokens as they are generated
+        
+        Args:
+            query: Question to answer
+            query_vector: Embedding of the question, if the caller already computed it
+        """
+        prompt = await self._build_prompt(query, query_vector)
+        if prompt is None:
+            yield EMPTY_KNOWLEDGE_BASE_ANSWER
+            return
+        
+        tokens = stream_generate(prompt, settings.SYSTEM_MESSAGES["knowledge_base"], operation="knowledge")
+        try:
+            async for token in tokens:
+                yield token
+        finally:
+            await tokens.aclose()
+    
+    def _document_files(self, filename: Optional[str] = None) -> List[Tuple[str, Dict]]:
+        """Manifest entries of the indexed files, in a stable order, optionally only the file with a path or name"""
+        if self.index is None:
             return []
+        files = self.index.manifest["files"]
+        return [
+            (rel_path, files[rel_path]) for rel_path in sorted(files)
+            if filename is None or filename in (rel_path, os.path.basename(rel_path))
+        ]
+
+    def _page_count(self, entry: Dict) -> int:
+        if "pages" not in entry:
+            # Indexes persisted before page counts were recorded
+            with open(os.path.join(self.index_root, "documents", entry["documents"]), encoding="utf-8") as f:
+                entry["pages"] = sum(1 for _ in f)
+        return entry["pages"]
+
+    def count_documents(self, filename: Optional[str] = None) -> int:
+        """Number of parsed documents (pages) in the knowledge base, optionally of one file only"""
+        return sum(self._page_count(entry) for _, entry in self._document_files(filename))
+
+    def iter_documents(self, offset: int = 0, limit: Optional[int] = None, filename: Optional[str] = None) -> Iterator[Document]:
+        """
+        Read parsed documents of the knowledge base from disk, in file order
+        
+        Only the requested page of documents is read and held in memory: files before the offset are
+        skipped using their page counts from the manifest. If a rescan prunes a file being listed, the
+        listing resumes from the manifest of the current generation on disk, once.
         
-        return self.documents
+        Args:
+            offset: Number of documents to skip
+            limit: Maximum number of documents to read, or None for all
+            filename: Only read the documents of the file with this path or name
+        
+        Raises:
+            FileNotFoundError: If the documents changed again while resuming
+        """
+        read = 0
+        for attempt in range(2):
+            try:
+                for doc in self._read_documents(offset + read, None if limit is None else limit - read, filename):
+                    read += 1
+                    yield doc
+                return
+            except FileNotFoundError:
+                if attempt:
+                    raise
+                print("------------------------------ Knowledge base documents changed while listing them, resuming from the new manifest")
+                # The rescan may have run in another worker, which does not update this worker's index
+                self.refresh(wait=True)
+
+    def _read_documents(self, offset: int, limit: Optional[int], filename: Optional[str]) -> Iterator[Document]:
+        remaining = limit
+        for rel_path, entry in self._document_files(filename):
+            if remaining is not None and remaining <= 0:
+                return
+            pages = self._page_count(entry)
+            if offset >= pages:
+                offset -= pages
+                continue
+            
+            with open(os.path.join(self.index_root, "documents", entry["documents"]), encoding="utf-8") as f:
+                for record in islice(f, offset, None if remaining is None else offset + remaining):
+                    record = json.loads(record)
+                    yield Document(page_content=record["page_content"], metadata=record["metadata"])
+                    if remaining is not None:
+                        remaining -= 1
+            offset = 0
 
 # Create a singleton instance
 rag_manager = RAGManager() 
\ No newline at end of file
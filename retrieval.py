@@ -0,0 +1,224 @@
+"""
+Hybrid retrieval for the knowledge base
+
+- KeywordIndex: a BM25 inverted index of the chunks, built at ingestion time next to the vector index
+- Approximate FAISS index types (IVF, HNSW) for large corpora, converted from the exact flat index
+- reciprocal_rank_fusion: merges the keyword and vector rankings
+- assemble_context: packs the best chunks into a token budget, dropping text shared by overlapping chunks
+"""
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+# Words too common to say anything about a chunk
+STOPWORDS = frozenset("""
+a about an and are as at be but by for from has have he her his i if in is it its me my not of on or our
+she so that the their them then there these they this to was we were what when where which who will with
+would you your
+""".split())
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens of a text, without stopwords"""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count of a text (about 4 characters per token for English)"""
+    return (len(text) + 3) // 4
+
+
+class KeywordIndex:
+    """
+    BM25 inverted index of chunks by id
+
+    The term frequencies of every chunk are kept so chunks can be removed when their file changes, and
+    are what is persisted; the postings are rebuilt from them on load.
+    """
+
+    def __init__(self, chunk_terms: Optional[Dict[str, Dict[str, int]]] = None, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunk_terms: Dict[str, Dict[str, int]] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.lengths: Dict[str, int] = {}
+        self.total_length = 0
+        for chunk_id, terms in (chunk_terms or {}).items():
+            self._index(chunk_id, terms)
+
+    def __len__(self) -> int:
+        return len(self.chunk_terms)
+
+    def _index(self, chunk_id: str, terms: Dict[str, int]):
+        self.chunk_terms[chunk_id] = terms
+        self.lengths[chunk_id] = sum(terms.values())
+        self.total_length += self.lengths[chunk_id]
+        for term, frequency in terms.items():
+            self.postings.setdefault(term, {})[chunk_id] = frequency
+
+    def add(self, chunk_id: str, text: str):
+        self._index(chunk_id, dict(Counter(tokenize(text))))
+
+    def delete(self, chunk_ids: Iterable[str]):
+        for chunk_id in chunk_ids:
+            terms = self.chunk_terms.pop(chunk_id, None)
+            if terms is None:
+                continue
+            self.total_length -= self.lengths.pop(chunk_id)
+            for term in terms:
+                postings = self.postings[term]
+                del postings[chunk_id]
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """
+        Rank chunks against a query with BM25
+
+        Returns:
+            Up to k (chunk id, score) tuples, best first
+        """
+        if not self.chunk_terms:
+            return []
+
+        count = len(self.chunk_terms)
+        average_length = self.total_length / count
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for chunk_id, frequency in postings.items():
+                norm = frequency + self.k1 * (1 - self.b + self.b * self.lengths[chunk_id] / average_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / norm
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def copy(self) -> "KeywordIndex":
+        return KeywordIndex(self.chunk_terms, self.k1, self.b)
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[str]:
+    """
+    Merge rankings of ids by Reciprocal Rank Fusion: each id scores the sum of 1 / (k + rank) over the rankings
+
+    Rank-based, so the incomparable BM25 scores and vector distances need no normalization.
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def faiss_index_type(index) -> str:
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def build_faiss_index(index_type: str, vectors: np.ndarray, ivf_lists: int = 1024, hnsw_neighbors: int = 32):
+    """
+    Build a FAISS index of the given type over vectors (L2 distance, as the flat index langchain creates)
+
+    The number of IVF lists is capped so every list gets enough training vectors.
+    """
+    dimension = vectors.shape[1]
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_neighbors)
+    elif index_type == "ivf":
+        lists = max(1, min(ivf_lists, len(vectors) // 39))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dimension), dimension, lists)
+        index.train(vectors)
+    else:
+        index = faiss.IndexFlatL2(dimension)
+    index.add(vectors)
+    return index
+
+
+def configure_search(index, ivf_probes: int, hnsw_ef_search: int):
+    """Set the accuracy/speed trade-off of approximate searches"""
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = hnsw_ef_search
+    elif isinstance(index, faiss.IndexIVF):
+        index.nprobe = ivf_probes
+
+
+def all_vectors(index) -> np.ndarray:
+    """Vectors stored in a FAISS index, by position"""
+    if isinstance(index, faiss.IndexIVF):
+        index.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def _overlap(previous: str, text: str, max_length: int, min_length: int = 16) -> int:
+    """Length of the longest end of previous (up to max_length characters) that text starts with"""
+    # Shorter matches are more likely a coincidence than a chunk overlap
+    for length in range(min(max_length, len(previous), len(text)), min_length - 1, -1):
+        if previous.endswith(text[:length]):
+            return length
+    return 0
+
+
+def assemble_context(documents: Iterable[Document], token_budget: int, max_documents: int, overlap: int) -> List[str]:
+    """
+    Select the passages of ranked chunks to put in a prompt
+
+    Chunks are taken best first until max_documents or the token budget is reached. Text a chunk shares
+    with an already selected chunk of the same page (the splitter's chunk overlap) is cut, and chunks
+    contained in a selected one are skipped. The first chunk is truncated if it alone exceeds the budget.
+
+    Args:
+        documents: Chunks, best first
+        token_budget: Maximum estimated tokens of all passages
+        max_documents: Maximum number of passages
+        overlap: Maximum characters shared by neighbouring chunks
+
+    Returns:
+        The passages, best first
+    """
+    selected: List[Tuple[Document, str]] = []
+    tokens = 0
+    for doc in documents:
+        if len(selected) >= max_documents:
+            break
+
+        text = doc.page_content
+        same_page = [
+            other.page_content for other, _ in selected
+            if other.metadata.get("source") == doc.metadata.get("source") and other.metadata.get("page") == doc.metadata.get("page")
+        ]
+        if any(text in other for other in same_page):
+            continue
+        for other in same_page:
+            # Neighbouring chunks share up to `overlap` characters on either side
+            shared = _overlap(other, text, overlap)
+            if shared:
+                text = text[shared:]
+            shared = _overlap(text, other, overlap)
+            if shared:
+                text = text[:-shared]
+        text = text.strip()
+        if not text:
+            continue
+
+        cost = estimate_tokens(text)
+        if tokens + cost > token_budget:
+            if selected:
+                continue
+            text = text[:token_budget * 4]
+            cost = estimate_tokens(text)
+        selected.append((doc, text))
+        tokens += cost
+    return [text for _, text in selected]
@@ -31,6 +31,44 @@ class Task(TaskBase):
     class Config:
         orm_mode = True
 
+class TaskBulkCreate(BaseModel):
+    """Pydantic model for creating tasks in bulk"""
+    tasks: List[TaskCreate] = Field(..., min_length=1, description="Tasks to create")
+
+class TaskBulkUpdateItem(TaskUpdate):
+    """Pydantic model for one task of a bulk update"""
+    id: int = Field(..., description="ID of the task to update")
+
+class TaskBulkUpdate(BaseModel):
+    """Pydantic model for updating tasks in bulk"""
+    tasks: List[TaskBulkUpdateItem] = Field(..., min_length=1, description="Task updates, each with the ID of its task")
+
+class TaskBulkDelete(BaseModel):
+    """Pydantic model for deleting tasks in bulk"""
+    ids: List[int] = Field(..., min_length=1, description="IDs of the tasks to delete")
+
+class TaskBatchGet(BaseModel):
+    """Pydantic model for fetching many tasks at once"""
+    ids: List[int] = Field(..., min_length=1, description="IDs of the tasks to fetch")
+
+class TaskBatchGetResponse(BaseModel):
+    """Pydantic model for the tasks fetched at once"""
+    tasks: List[Optional[Task]] = Field(..., description="Tasks in the order of the requested IDs, null for unknown IDs")
+    missing: List[int] = Field(..., description="Requested IDs with no task")
+
+class BulkItemResult(BaseModel):
+    """Pydantic model for the result of one item of a bulk request"""
+    index: int = Field(..., description="Position of the item in the request")
+    id: Optional[int] = Field(None, description="ID of the task")
+    status_code: int = Field(..., description="HTTP status code the item would have had as a single request")
+    detail: Optional[str] = Field(None, description="Error detail, if the item failed")
+
+class BulkResponse(BaseModel):
+    """Pydantic model for bulk request results"""
+    succeeded: int = Field(..., description="Number of items applied")
+    failed: int = Field(..., description="Number of items rejected")
+    results: List[BulkItemResult] = Field(..., description="Result of each item, in request order")
+
 class KnowledgeQuery(BaseModel):
     """Pydantic model for knowledge base queries"""
     question: str = Field(..., min_length=1, description="The question to ask the knowledge base")
@@ -44,8 +82,56 @@ class DocumentContent(BaseModel):
     filename: str = Field(..., description="Name of the document file")
     content: str = Field(..., description="Content of the document")
     metadata: Dict = Field(default_factory=dict, description="Metadata associated with the document")
+    truncated: bool = Field(False, description="Whether the content was truncated to max_chars")
 
 class DocumentsResponse(BaseModel):
-    """Pydantic model for response containing all document contents"""
-    documents: List[DocumentContent] = Field(..., description="List of all parsed documents")
-    total_count: int = Field(..., description="Total number of documents") 
\ No newline at end of file
+    """Pydantic model for a page of document contents"""
+    documents: List[DocumentContent] = Field(..., description="Parsed documents of the page")
+    total_count: int = Field(..., description="Total number of documents matching the filter")
+    offset: int = Field(0, description="Offset of the first document of the page")
+    next_offset: Optional[int] = Field(None, description="Offset of the next page, None on the last page")
+
+class KnowledgeRescanResponse(BaseModel):
+    """Pydantic model for the result of a knowledge base rescan"""
+    added: List[str] = Field(..., description="Files added to the knowledge base")
+    updated: List[str] = Field(..., description="Files re-ingested because their content changed")
+    removed: List[str] = Field(..., description="Files removed from the knowledge base")
+    unchanged: int = Field(..., description="Number of files left untouched")
+    embedded_chunks: int = Field(..., description="Number of chunks embedded during the rescan")
+    removed_chunks: int = Field(..., description="Number of stale chunks removed from the vector store")
+    generation: int = Field(..., description="Generation of the persisted index after the rescan")
+    ingestion: Dict = Field(default_factory=dict, description="Per-stage ingestion timings and throughput (files/s, chunks/s)")
+
+class KnowledgeStatus(BaseModel):
+    """Pydantic model for the readiness of the knowledge base"""
+    status: str = Field(..., description="Lifecycle of the knowledge base build (idle, warming, ready, failed)")
+    ready: bool = Field(..., description="Whether knowledge base queries can be served")
+    rebuilding: bool = Field(..., description="Whether a build or rescan is running")
+    generation: Optional[int] = Field(None, description="Generation of the index serving queries")
+    files: int = Field(..., description="Number of files in the index serving queries")
+    progress: Dict = Field(default_factory=dict, description="Progress of the running build (stage, files parsed, chunks embedded)")
+    ingestion: Dict = Field(default_factory=dict, description="Timings and throughput of the last build")
+    error: Optional[str] = Field(None, description="Error of the last failed build")
+
+class CacheNamespaceStats(BaseModel):
+    """Pydantic model for the cache statistics of one key namespace"""
+    keys: int = Field(..., description="Number of keys in the namespace")
+    memory_bytes: Optional[int] = Field(None, description="Estimated memory used by the namespace in bytes, if MEMORY USAGE is available")
+    hits: int = Field(..., description="Cache hits served by this process")
+    misses: int = Field(..., description="Cache misses in this process")
+    hit_rate: float = Field(..., description="Fraction of lookups in this process that were hits")
+
+class LocalCacheStats(BaseModel):
+    """Pydantic model for the statistics of the in-process cache tier of this process"""
+    enabled: bool = Field(..., description="Whether the in-process tier is enabled")
+    subscribed: bool = Field(..., description="Whether the tier receives invalidations, and is therefore in use")
+    entries: int = Field(..., description="Number of cached entries")
+    bytes: int = Field(..., description="Serialized size of the cached entries")
+    max_entries: int = Field(..., description="Maximum number of cached entries")
+    max_bytes: int = Field(..., description="Maximum serialized size of the cached entries")
+
+class CacheStats(BaseModel):
+    """Pydantic model for the cache statistics"""
+    prefix: str = Field(..., description="Key prefix of the API's cache entries")
+    namespaces: Dict[str, CacheNamespaceStats] = Field(..., description="Statistics per key namespace, in-process tier lookups under <namespace>-local")
+    local: LocalCacheStats = Field(..., description="In-process cache tier of this process")
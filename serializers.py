@@ -0,0 +1,66 @@
+"""
+Serialization of cache values
+
+Values written by a serializer start with a one-byte format tag, so the serializer can be changed
+(CACHE_SERIALIZER) without flushing the cache: entries of every format stay readable, and untagged
+entries are the plain JSON written before tags existed.
+"""
+import json
+import msgpack
+import orjson
+from settings import settings
+
+ORJSON_TAG = b"\x01"
+MSGPACK_TAG = b"\x02"
+
+class JSONSerializer:
+    """Untagged standard library JSON, readable by workers predating format tags (for rolling deploys)"""
+    name = "json"
+
+    def dumps(self, value) -> bytes:
+        return json.dumps(value).encode()
+
+class ORJSONSerializer:
+    """JSON encoded with orjson, which is also the response format, so entries can be sent as they are"""
+    name = "orjson"
+
+    def dumps(self, value) -> bytes:
+        return ORJSON_TAG + orjson.dumps(value)
+
+class MsgpackSerializer:
+    """Compact binary MessagePack"""
+    name = "msgpack"
+
+    def dumps(self, value) -> bytes:
+        return MSGPACK_TAG + msgpack.packb(value, use_bin_type=True)
+
+SERIALIZERS = {serializer.name: serializer for serializer in (JSONSerializer(), ORJSONSerializer(), MsgpackSerializer())}
+
+def get_serializer(name: str = None):
+    """Return the serializer named name, by default CACHE_SERIALIZER"""
+    name = name or settings.CACHE_SERIALIZER
+    if name not in SERIALIZERS:
+        raise ValueError(f"Unknown cache serializer {name!r}. Must be one of: {', '.join(SERIALIZERS)}")
+    return SERIALIZERS[name]
+
+def dumps(value) -> bytes:
+    """Serialize a value with the configured serializer"""
+    return get_serializer().dumps(value)
+
+def loads(data: bytes):
+    """Deserialize a value written by any serializer, detected by its format tag"""
+    tag = data[:1]
+    if tag == ORJSON_TAG:
+        return orjson.loads(data[1:])
+    if tag == MSGPACK_TAG:
+        return msgpack.unpackb(data[1:], raw=False)
+    return json.loads(data)
+
+def to_json(data: bytes) -> bytes:
+    """JSON encoding of a serialized value, without decoding it when it already is JSON"""
+    tag = data[:1]
+    if tag == ORJSON_TAG:
+        return data[1:]
+    if tag == MSGPACK_TAG:
+        return orjson.dumps(msgpack.unpackb(data[1:], raw=False))
+    return data
@@ -9,20 +9,70 @@ class Settings(BaseSettings):
     # Redis settings
     REDIS_URL: str = "redis://redis:6379/0"
     REDIS_CACHE_EXPIRATION: int = 3600  # 1 hour in seconds
+    REDIS_MAX_CONNECTIONS: int = 50  # Pooled connections to Redis per process
+    REDIS_POOL_TIMEOUT: float = 0.5  # Seconds to wait for a free pooled connection
+    REDIS_SOCKET_TIMEOUT: float = 0.25  # Seconds before a Redis command is considered failed
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 0.25  # Seconds to wait for a connection to Redis
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30  # Seconds a connection may be idle before it is health checked
+    REDIS_RETRY_INTERVAL: float = 5.0  # Seconds the cache is bypassed after repeated Redis failures
+    REDIS_FAILURE_THRESHOLD: int = 3  # Consecutive Redis failures (not counting pool waits) before the cache is bypassed
+    REDIS_PENDING_INVALIDATIONS_MAX: int = 10000  # Stale keys remembered per process while Redis fails; beyond that, their namespaces are deleted
+    REDIS_KEY_PREFIX: str = "taskapi:"  # Namespace of every key written by the API, e.g. taskapi:task:42
+    SUMMARY_CACHE_EXPIRATION: int = 86400  # 1 day in seconds; summaries are also invalidated on task updates
+    SUMMARY_LOCK_TIMEOUT: float = 120.0  # Seconds a worker waits for another worker generating the same summary
+    ANSWER_CACHE_EXPIRATION: int = 3600  # 1 hour in seconds, for answers to /query and /knowledge/query
+    ANSWER_CACHE_SEMANTIC: bool = True  # Also reuse answers of similar questions, compared by embedding
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: float = 0.95  # Minimum cosine similarity for a semantic cache hit
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000  # Questions kept per process by the semantic cache (least recently used are evicted)
+    CACHE_STATS_SCAN_COUNT: int = 1000  # Keys per SCAN call when computing cache stats
+    CACHE_STATS_MEMORY_SAMPLE: int = 200  # Keys per namespace sampled with MEMORY USAGE to estimate its memory
+    CACHE_SERIALIZER: str = "orjson"  # Format of new cache entries: orjson, msgpack or json (untagged, readable by older versions)
+    LOCAL_CACHE_ENABLED: bool = False  # In-process LRU tier in front of Redis, kept coherent across workers by pub/sub
+    LOCAL_CACHE_NAMESPACES: list[str] = ["task"]  # Key namespaces served by the in-process tier
+    LOCAL_CACHE_MAX_ENTRIES: int = 10000  # Entries kept per process (least recently used are evicted)
+    LOCAL_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Serialized size of the entries kept per process
+    LOCAL_CACHE_EXPIRATION: float = 10.0  # Seconds, bounds staleness should an invalidation message be missed
     
     # Ollama settings
     OLLAMA_HOST: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3.2-medieval"
-    OLLAMA_EMBEDDING_MODEL: str = "llama3.2-medieval"
+    OLLAMA_EMBEDDING_MODEL: str = "nomic-embed-text"  # Model embedding knowledge base chunks and questions; changing it rebuilds the index
+    EMBEDDING_CACHE_PATH: str = "/app/cache/embeddings.sqlite3"  # On-disk embedding cache shared by the workers; empty to disable
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200000  # Embeddings kept on disk, oldest first evicted (about 3 KB each with nomic-embed-text)
+    OLLAMA_TIMEOUT: float = 120.0  # Seconds to wait for a response from Ollama
+    OLLAMA_CONNECT_TIMEOUT: float = 5.0  # Seconds to wait for a connection to Ollama
+    OLLAMA_MAX_CONNECTIONS: int = 16  # Pooled keep-alive connections to Ollama per process
+    OLLAMA_KEEPALIVE_EXPIRY: float = 60.0  # Seconds an idle pooled connection is kept open
+    LLM_MAX_CONCURRENCY: int = 4  # LLM generations in flight per process; further requests wait without holding a thread
     
     # Knowledge base settings
     DATA_DIR: str = "/app/data"
+    RAG_INDEX_DIR: str = "/app/index"  # Persisted FAISS indexes, one sub-directory per index key
     
     # Additional RAG parameters that were missing
     RAG_TOP_K_RESULTS: int = 3
     RAG_CHUNK_SIZE: int = 1000
     RAG_CHUNK_OVERLAP: int = 200
 
+    # Knowledge base retrieval
+    RAG_HYBRID_SEARCH: bool = True  # Fuse BM25 keyword matches with the vector search results
+    RAG_CANDIDATES: int = 20  # Chunks retrieved by each of the keyword and vector searches before fusion
+    RAG_RRF_K: int = 60  # Reciprocal Rank Fusion constant; larger values flatten the weight of top ranks
+    RAG_CONTEXT_TOKENS: int = 750  # Estimated token budget of the retrieved context in a prompt
+    RAG_FAISS_INDEX_TYPE: str = "flat"  # flat (exact), ivf or hnsw (approximate, for large corpora)
+    RAG_ANN_MIN_VECTORS: int = 10000  # Approximate index types are only used from this many vectors on
+    RAG_IVF_LISTS: int = 1024  # Inverted lists of an ivf index (capped by the number of vectors)
+    RAG_IVF_PROBES: int = 16  # Lists searched per ivf query
+    RAG_HNSW_NEIGHBORS: int = 32  # Graph neighbours per vector of an hnsw index
+    RAG_HNSW_EF_SEARCH: int = 64  # Candidate list size of hnsw queries
+
+    # Knowledge base ingestion pipeline
+    RAG_INGEST_WORKERS: int = 4  # Processes parsing PDF/EPUB files in parallel
+    RAG_EMBEDDING_BATCH_SIZE: int = 32  # Chunks per embedding request batch
+    RAG_EMBEDDING_CONCURRENCY: int = 4  # Embedding batches in flight to Ollama at once
+    RAG_BUILD_RETRY_INITIAL: float = 5.0  # Seconds before retrying a failed startup build, doubling after every failure
+    RAG_BUILD_RETRY_MAX: float = 300.0  # Longest wait between startup build retries
+
     # System messages for Ollama
     SYSTEM_MESSAGES: dict = {
         "general": "You are a helpful AI assistant focused on task management.",
@@ -32,6 +82,12 @@ class Settings(BaseSettings):
     
     # Task status options
     VALID_TASK_STATUSES: list[str] = ["Pending", "In Progress", "Complete", "Backlog"]
+
+    # Bulk task endpoints
+    BULK_MAX_ITEMS: int = 50000  # Maximum number of tasks per bulk request
+    BULK_BATCH_SIZE: int = 1000  # Rows per multi-row statement (and ids per IN list / Redis DEL)
+    BATCH_GET_MAX_IDS: int = 1000  # Maximum number of task IDs per POST /tasks/batch-get
+    EXPORT_BATCH_SIZE: int = 5000  # Rows fetched from the server-side cursor per batch by GET /tasks/export
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,10 @@
+import os
+import tempfile
+
+# The application reads its settings at import, so configure it before any test module imports it:
+# a scratch SQLite database, no on-disk embedding cache and an empty knowledge base
+_work_dir = tempfile.mkdtemp(prefix="taskapi-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_work_dir, 'tasks.db')}"
+os.environ["EMBEDDING_CACHE_PATH"] = ""
+os.environ["RAG_INDEX_DIR"] = os.path.join(_work_dir, "index")
+os.environ["DATA_DIR"] = os.path.join(_work_dir, "data")
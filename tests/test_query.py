@@ -0,0 +1,51 @@
+import asyncio
+
+import fakeredis.aioredis
+import httpx
+
+import main
+from cache import get_redis
+
+
+def test_query_answers_when_embedding_fails(monkeypatch):
+    async def failing_embedding(question):
+        raise ConnectionError("embedding model not found")
+
+    async def chat(**kwargs):
+        return {"message": {"content": "Verily."}, "prompt_eval_count": 1, "eval_count": 1}
+
+    monkeypatch.setattr(main.settings, "ANSWER_CACHE_SEMANTIC", True)
+    monkeypatch.setattr(main.rag_manager.ollama_embeddings, "aembed_query", failing_embedding)
+    monkeypatch.setattr(main.async_ollama_client, "chat", chat)
+    redis_client = fakeredis.aioredis.FakeRedis()
+    main.app.dependency_overrides[get_redis] = lambda: redis_client
+
+    async def post():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post("/query", json={"question": "How is a sword forged?"})
+
+    try:
+        response = asyncio.run(post())
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert response.json()["answer"] == "Verily."
+
+
+def test_knowledge_requests_report_a_failed_build(monkeypatch):
+    monkeypatch.setattr(main.rag_manager, "index", None)
+    monkeypatch.setattr(main.rag_manager, "status", "failed")
+    monkeypatch.setattr(main.rag_manager, "error", "ollama unreachable")
+
+    async def get():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get("/knowledge/documents")
+
+    response = asyncio.run(get())
+
+    assert response.status_code == 503
+    assert "failed" in response.json()["detail"]
+    assert "ollama unreachable" in response.json()["detail"]
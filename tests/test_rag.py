@@ -0,0 +1,67 @@
+from langchain.schema import Document
+
+from rag import KnowledgeIndex, RAGManager
+
+
+def publish(manager, files):
+    """Publish a generation with one single-page document per file, as a rescan of such a corpus would"""
+    with manager._index_lock(exclusive=True):
+        index = KnowledgeIndex(manager._empty_manifest())
+        current = manager._current_generation()
+        index.manifest["generation"] = int(current[len("gen-"):]) if current else 0
+        for rel_path, text in files.items():
+            name = manager._save_file_documents([Document(page_content=text, metadata={"source": rel_path})])
+            index.manifest["files"][rel_path] = {"documents": name, "pages": 1, "chunk_ids": []}
+        manager._save_index(index)
+        manager._swap_index(index)
+        manager._prune_index(index)
+
+
+def test_workers_swap_in_published_generations(tmp_path, monkeypatch):
+    monkeypatch.setattr("rag.settings.RAG_INDEX_DIR", str(tmp_path))
+    rescanning, serving = RAGManager(), RAGManager()
+
+    publish(rescanning, {"a.pdf": "old"})
+    assert serving.refresh()
+    publish(rescanning, {"a.pdf": "new"})
+
+    # The generation the other worker serves is kept until it swaps
+    assert [doc.page_content for doc in serving.iter_documents()] == ["old"]
+    assert serving.has_new_generation
+    assert serving.refresh()
+    assert not serving.has_new_generation
+    assert serving.index.manifest["generation"] == rescanning.index.manifest["generation"]
+
+
+def test_listing_resumes_from_the_generation_on_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr("rag.settings.RAG_INDEX_DIR", str(tmp_path))
+    rescanning, serving = RAGManager(), RAGManager()
+    publish(rescanning, {"a.pdf": "old", "b.pdf": "old"})
+    serving.refresh()
+    publish(rescanning, {"a.pdf": "new", "b.pdf": "new"})
+
+    # Documents of the served generation pruned anyway, e.g. by a worker running an older version
+    for entry in serving.index.manifest["files"].values():
+        (tmp_path / serving.index_key / "documents" / entry["documents"]).unlink()
+
+    assert [doc.page_content for doc in serving.iter_documents()] == ["new", "new"]
+
+
+def test_failed_build_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setattr("rag.settings.RAG_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr("rag.settings.RAG_BUILD_RETRY_INITIAL", 0)
+    manager = RAGManager()
+    attempts = []
+
+    def rescan():
+        attempts.append(manager.status)
+        if len(attempts) < 3:
+            raise ConnectionError("ollama unreachable")
+        return {}
+
+    monkeypatch.setattr(manager, "rescan_knowledge_base", rescan)
+    manager._initialize_until_ready()
+
+    assert attempts == ["warming", "failed", "failed"]
+    assert manager.status == "ready"
+    assert manager.error is None
@@ -0,0 +1,45 @@
+import asyncio
+
+import fakeredis.aioredis
+import httpx
+
+import cache
+import init_db
+import main
+from cache import get_redis
+
+
+def test_out_of_order_cache_writes_keep_the_latest_update(monkeypatch):
+    init_db.init_db()
+    redis_client = fakeredis.aioredis.FakeRedis()
+    main.app.dependency_overrides[get_redis] = lambda: redis_client
+
+    second_update_done = asyncio.Event()
+    set_cache = cache.set_cache
+
+    async def delayed_set_cache(redis_client, key, value, **kwargs):
+        # The first update commits first but writes the cache after the second one
+        if isinstance(value, dict) and value.get("title") == "first":
+            await second_update_done.wait()
+        await set_cache(redis_client, key, value, **kwargs)
+
+    monkeypatch.setattr(main, "set_cache", delayed_set_cache)
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            task_id = (await client.post("/tasks", json={"title": "created", "description": "d"})).json()["id"]
+            first = asyncio.create_task(client.put(f"/tasks/{task_id}", json={"title": "first"}))
+            await asyncio.sleep(0.2)
+            second = await client.put(f"/tasks/{task_id}", json={"title": "second"})
+            second_update_done.set()
+            await first
+            return second, (await client.get(f"/tasks/{task_id}")).json()
+
+    try:
+        second, cached = asyncio.run(run())
+    finally:
+        main.app.dependency_overrides.clear()
+
+    assert second.json()["title"] == "second"
+    assert cached["title"] == "second"